@@ -0,0 +1,193 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import prefetch_related_objects
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from foodgram.routers import primary_reads, replica_reads
+from recipes.index import ingredient_index
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from .authentication import CachedTokenAuthentication
+from .cache import (feed_key, get_cache, get_validators, get_version,
+                    response_key, set_cache_headers)
+from .paginators import PageNumberPaginatorModified
+from .search import get_search_candidates, search_database
+from .serializers import IngredientSerializer, RecipeSerializer, TagSerializer
+from .services import (annotate_user_flags, apply_user_flags,
+                       get_recipe_prefetches)
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+def async_view(viewset, actions, handler):
+    """Serve JSON GET requests with `handler`, everything else with DRF.
+
+    The handler returns None for anything it does not reproduce exactly
+    (browsable API, unknown parameters, errors), and the request is then
+    passed to the regular viewset in a worker thread.
+    """
+    sync_view = sync_to_async(viewset.as_view(actions))
+
+    async def view(request, *args, **kwargs):
+        response = None
+        if (request.method == 'GET'
+                and 'text/html' not in request.headers.get('Accept', '')):
+            token = replica_reads.set(True)
+            try:
+                response = await handler(request, *args, **kwargs)
+            finally:
+                replica_reads.reset(token)
+        if response is None:
+            response = await sync_view(request, *args, **kwargs)
+        return response
+
+    view.csrf_exempt = True
+    return view
+
+
+def json_response(data):
+    response = JsonResponse(data, safe=False, json_dumps_params={
+        'ensure_ascii': False, 'separators': (',', ':'),
+    })
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+async def get_user(request):
+    try:
+        credentials = await CachedTokenAuthentication().aauthenticate(
+            request
+        )
+    except APIException:
+        return None
+    if credentials is None:
+        return AnonymousUser()
+    return credentials[0]
+
+
+async def serialize_recipes(request, recipes):
+    await sync_to_async(prefetch_related_objects)(
+        recipes, *get_recipe_prefetches()
+    )
+    return RecipeSerializer(
+        recipes, many=True, context={'request': request}
+    ).data
+
+
+async def cached_json(request, namespace, build):
+    version = await sync_to_async(get_version)(namespace)
+    key = response_key(namespace, version, request, 'json')
+    etag, last_modified = get_validators(key, version)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        cache = get_cache()
+        data = await cache.aget(key)
+        if data is None:
+            with primary_reads():
+                data = await build(request)
+            await cache.aset(key, data, settings.API_CACHE_TIMEOUT)
+        response = json_response(data)
+    set_cache_headers(response, etag, last_modified)
+    return response
+
+
+async def build_tags(request):
+    return [TagSerializer(tag).data async for tag in Tag.objects.all()]
+
+
+async def build_ingredients(request):
+    name = request.GET.get('name')
+    limit = settings.INGREDIENT_SEARCH_LIMIT
+    queryset = Ingredient.objects.all()
+    if name and settings.INGREDIENT_INDEX_ENABLED:
+        return IngredientSerializer(
+            await sync_to_async(ingredient_index.search)(
+                get_search_candidates(name), limit
+            ),
+            many=True,
+        ).data
+    if name:
+        queryset = search_database(
+            queryset, get_search_candidates(name), limit
+        )
+    return [
+        IngredientSerializer(ingredient).data
+        async for ingredient in queryset
+    ]
+
+
+async def tag_list(request):
+    if set(request.GET):
+        return None
+    return await cached_json(request, 'tags', build_tags)
+
+
+async def ingredient_list(request):
+    if not set(request.GET).issubset(('name',)):
+        return None
+    return await cached_json(request, 'ingredients', build_ingredients)
+
+
+def build_feed(request):
+    view = RecipeViewSet(
+        action='list', request=Request(request), format_kwarg=None
+    )
+    return view.build_feed()
+
+
+async def recipe_list(request):
+    if not set(request.GET).issubset(RecipeViewSet.feed_cache_params):
+        return None
+    user = await get_user(request)
+    if user is None:
+        return None
+
+    key = await sync_to_async(feed_key)('recipes', request)
+    cache = get_cache()
+    data = await cache.aget(key)
+    count_strategy = 'cached'
+    if data is None:
+        try:
+            data, count_strategy = await sync_to_async(build_feed)(request)
+        except APIException:
+            return None
+        await cache.aset(key, data, settings.API_CACHE_TIMEOUT)
+    if user.is_authenticated:
+        await sync_to_async(apply_user_flags)(data, user)
+    response = json_response(data)
+    if isinstance(data, dict) and 'count' in data:
+        response[PageNumberPaginatorModified.count_strategy_header] = (
+            count_strategy
+        )
+    return response
+
+
+async def recipe_detail(request, pk):
+    user = await get_user(request)
+    if request.GET or user is None:
+        return None
+    recipe = await annotate_user_flags(
+        Recipe.objects.select_related('author'), user
+    ).filter(pk=pk).afirst()
+    if recipe is None:
+        return None
+    data = await serialize_recipes(request, [recipe])
+    return json_response(data[0])
+
+
+tags = async_view(TagViewSet, {'get': 'list'}, tag_list)
+ingredients = async_view(IngredientViewSet, {'get': 'list'}, ingredient_list)
+recipes = async_view(
+    RecipeViewSet, {'get': 'list', 'post': 'create'}, recipe_list
+)
+recipe = async_view(RecipeViewSet, {
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}, recipe_detail)
@@ -0,0 +1,103 @@
+from hashlib import sha256
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+
+from foodgram.metrics import token_cache_stats
+from rest_framework.authentication import (TokenAuthentication,
+                                           get_authorization_header)
+from rest_framework.exceptions import AuthenticationFailed
+
+from .cache import get_cache
+
+
+def token_cache_key(key):
+    return f'api:token:{sha256(key.encode()).hexdigest()}'
+
+
+def get_cached_user(key):
+    user = get_cache().get(token_cache_key(key))
+    token_cache_stats.observe(user is not None)
+    return user
+
+
+async def aget_cached_user(key):
+    user = await get_cache().aget(token_cache_key(key))
+    token_cache_stats.observe(user is not None)
+    return user
+
+
+def invalidate_token(key):
+    transaction.on_commit(lambda: get_cache().delete(token_cache_key(key)))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that keeps token -> user in the API cache.
+
+    Entries live TOKEN_CACHE_TIMEOUT seconds and are dropped by signals
+    when the token is deleted (logout) or the user is saved, which covers
+    password changes and deactivation.
+
+    Invalidation only reaches other workers through a shared cache
+    backend. With the default LocMemCache every process keeps its own
+    copy, so a revoked token keeps working in the other workers for up
+    to TOKEN_CACHE_TIMEOUT seconds.
+    """
+
+    def get_key(self, request):
+        """Token from the Authorization header, None without a token."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise AuthenticationFailed(_(
+                'Invalid token header. No credentials provided.'
+            ))
+        if len(auth) > 2:
+            raise AuthenticationFailed(_(
+                'Invalid token header. '
+                'Token string should not contain spaces.'
+            ))
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(_(
+                'Invalid token header. '
+                'Token string should not contain invalid characters.'
+            ))
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        """`authenticate()` for the async views: cache hits need no thread."""
+        key = self.get_key(request)
+        if key is None:
+            return None
+        user = await aget_cached_user(key)
+        if user is None:
+            return await sync_to_async(self.load_credentials)(key)
+        return self.check_cached_user(key, user)
+
+    def authenticate_credentials(self, key):
+        user = get_cached_user(key)
+        if user is None:
+            return self.load_credentials(key)
+        return self.check_cached_user(key, user)
+
+    def load_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        get_cache().set(
+            token_cache_key(key), user, settings.TOKEN_CACHE_TIMEOUT
+        )
+        return user, token
+
+    def check_cached_user(self, key, user):
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return user, self.get_model()(key=key, user=user)
@@ -0,0 +1,75 @@
+import time
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import quote_etag
+from django.utils.http import http_date
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def get_version(namespace):
+    key = f'api:version:{namespace}'
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(namespace):
+    get_cache().set(f'api:version:{namespace}', time.time(), None)
+
+
+def make_key(prefix, namespace, version, *parts):
+    digest = md5(':'.join(map(str, parts)).encode()).hexdigest()
+    return f'api:{prefix}:{namespace}:{version}:{digest}'
+
+
+def get_validators(key, version):
+    return quote_etag(md5(key.encode()).hexdigest()), int(version)
+
+
+def set_cache_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = (
+        f'public, max-age={settings.API_CACHE_MAX_AGE}'
+    )
+
+
+def encode_params(query_params, keys=None):
+    return urlencode(sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        if keys is None or key in keys
+        for value in values
+    ))
+
+
+def response_key(namespace, version, request, format):
+    return make_key(
+        'response', namespace, version, request.path,
+        encode_params(request.GET), format,
+    )
+
+
+def feed_key(namespace, request):
+    return make_key(
+        'feed', namespace, get_version(namespace), request.get_host(),
+        encode_params(request.GET),
+    )
+
+
+def user_flags_key(user_id):
+    return f'api:user-flags:{user_id}'
+
+
+def invalidate_user_flags(user):
+    get_cache().delete(user_flags_key(user.id))
@@ -0,0 +1,49 @@
+from hashlib import sha256
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from rest_framework.serializers import ValidationError
+
+
+class HashedImageField(Base64ImageField):
+    """Image sent as base64 or as a multipart file, stored under a hash.
+
+    Uploading the same picture twice reuses the stored file instead of
+    writing a copy, and the name never changes for the same content, so
+    it can be cached forever. Multipart files are hashed chunk by chunk,
+    so large uploads stay in the temporary file Django streamed them to.
+    """
+
+    def get_file_name(self, decoded_file):
+        return sha256(decoded_file).hexdigest()[:40]
+
+    def get_uploaded_image(self, data):
+        image = super(Base64FieldMixin, self).to_internal_value(data)
+        extension = image.image.format.lower()
+        if extension == 'jpeg':
+            extension = 'jpg'
+        if extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        digest = sha256()
+        for chunk in image.chunks():
+            digest.update(chunk)
+        image.seek(0)
+        image.name = f'{digest.hexdigest()[:40]}.{extension}'
+        return image
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            image = self.get_uploaded_image(data)
+        else:
+            image = super().to_internal_value(data)
+        if image is None:
+            return image
+        upload_to = self.parent.Meta.model._meta.get_field(
+            self.source
+        ).upload_to
+        name = f'{upload_to}{image.name}'
+        if default_storage.exists(name):
+            return name
+        return image
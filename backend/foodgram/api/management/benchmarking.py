@@ -0,0 +1,51 @@
+"""Общие помощники команд benchmark_*."""
+from wsgiref.util import setup_testing_defaults
+
+
+def percentile(values, rank):
+    """Перцентиль отсортированного списка, None для пустого."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, len(values) * rank // 100)]
+
+
+def latency_percentiles(timings, ranks):
+    timings = sorted(timings)
+    return {
+        f'p{rank}': round(percentile(timings, rank), 3) if timings else None
+        for rank in ranks
+    }
+
+
+def split_path(path):
+    path, _, query = path.partition('?')
+    return path, query
+
+
+def wsgi_request(application, path, method='GET', stream=None, **environ):
+    """Запрос к WSGI-приложению без сервера: статус и тело ответа.
+
+    `environ` дополняет окружение, например CONTENT_TYPE или
+    HTTP_AUTHORIZATION; тело запроса читается из `stream`.
+    """
+    path, query = split_path(path)
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'HTTP_HOST': 'testserver',
+        'HTTP_ACCEPT': 'application/json',
+        **environ,
+    }
+    if stream is not None:
+        environ['wsgi.input'] = stream
+    setup_testing_defaults(environ)
+    statuses = []
+    response = application(
+        environ, lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    try:
+        content = b''.join(response)
+    finally:
+        getattr(response, 'close', lambda: None)()
+    return int(statuses[0].split()[0]), content
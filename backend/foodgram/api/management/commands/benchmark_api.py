@@ -0,0 +1,160 @@
+import json
+from datetime import datetime, timezone
+from statistics import mean, median
+from time import perf_counter
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+
+from api.cache import get_cache
+from api.management.benchmarking import latency_percentiles
+
+User = get_user_model()
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет основные эндпоинты API через тестовый клиент DRF и '
+        'сохраняет перцентили задержки и число SQL-запросов в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--username')
+        parser.add_argument('--output', default='benchmark_api.json')
+        parser.add_argument('--label', default='')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        tag = Tag.objects.first()
+        ingredient = Ingredient.objects.first()
+        if None in (recipe, tag, ingredient):
+            raise CommandError('Недостаточно данных, выполните seed_data')
+
+        search = ingredient.name[:3]
+        endpoints = (
+            ('recipes_list', None, '/api/recipes/'),
+            ('recipes_list_auth', user, '/api/recipes/'),
+            ('recipes_list_tags', user, f'/api/recipes/?tags={tag.slug}'),
+            ('recipes_list_favorited', user, '/api/recipes/?is_favorited=1'),
+            ('recipes_list_cursor', user, '/api/recipes/?cursor='),
+            ('recipes_detail', user, f'/api/recipes/{recipe.id}/'),
+            ('recipes_popular', user, '/api/recipes/popular/'),
+            ('ingredients_list', None, '/api/ingredients/'),
+            ('ingredients_search', None, f'/api/ingredients/?name={search}'),
+            (
+                'users_subscriptions', user,
+                '/api/users/subscriptions/?page=1&limit=6&recipes_limit=3'
+            ),
+            (
+                'download_shopping_cart', user,
+                '/api/recipes/download_shopping_cart/'
+            ),
+        )
+
+        results = {}
+        for name, client_user, path in endpoints:
+            client = APIClient()
+            if client_user is not None:
+                client.force_authenticate(client_user)
+            results[name] = self.measure(client, path, options)
+            self.stdout.write(
+                f'{name}: p50 {results[name]["latency_ms"]["p50"]} мс, '
+                f'p95 {results[name]["latency_ms"]["p95"]} мс, '
+                f'запросов к БД {results[name]["queries"]["max"]}'
+            )
+
+        report = {
+            'meta': {
+                'label': options['label'],
+                'created': datetime.now(timezone.utc).isoformat(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'cold': options['cold'],
+                'dataset': {
+                    'users': User.objects.count(),
+                    'recipes': Recipe.objects.count(),
+                    'ingredients': Ingredient.objects.count(),
+                    'tags': Tag.objects.count(),
+                },
+            },
+            'endpoints': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2,
+                      sort_keys=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчёт сохранён в {options["output"]}'
+        ))
+
+    def get_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            user = User.objects.annotate(
+                carts_total=Count('carts', distinct=True),
+                subscribe_total=Count('subscribe', distinct=True),
+            ).filter(
+                carts_total__gt=0, subscribe_total__gt=0
+            ).order_by('-subscribe_total', 'id').first()
+        if user is None:
+            raise CommandError('Пользователь для замеров не найден')
+        return user
+
+    def request(self, client, path):
+        response = client.get(path)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        return response.status_code, size
+
+    def measure(self, client, path, options):
+        for _ in range(options['warmup']):
+            self.request(client, path)
+
+        timings = []
+        queries = []
+        statuses = set()
+        size = 0
+        for _ in range(options['requests']):
+            if options['cold']:
+                get_cache().clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = perf_counter()
+                status, size = self.request(client, path)
+                timings.append((perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            statuses.add(status)
+
+        latency = latency_percentiles(timings, PERCENTILES)
+        latency.update(
+            mean=round(mean(timings), 3) if timings else None,
+            max=round(max(timings), 3) if timings else None,
+        )
+        return {
+            'path': path,
+            'status': sorted(statuses),
+            'bytes': size,
+            'latency_ms': latency,
+            'queries': {
+                'median': median(queries) if queries else None,
+                'max': max(queries, default=None),
+            },
+        }
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from time import perf_counter, sleep
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from api.management.benchmarking import (latency_percentiles, split_path,
+                                         wsgi_request)
+from recipes.models import Ingredient, Recipe
+
+PERCENTILES = (50, 95, 99)
+DUMMY_CACHE = 'django.core.cache.backends.dummy.DummyCache'
+
+
+async def asgi_get(application, path):
+    path, query = split_path(path)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'accept', b'application/json'),
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    disconnect = asyncio.Event()
+    messages = []
+
+    async def receive():
+        if not messages:
+            messages.append(None)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    response = {'status': None, 'size': 0}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['size'] += len(message.get('body', b''))
+
+    await application(scope, receive, send)
+    disconnect.set()
+    return response['status'], response['size']
+
+
+def add_latency(latency):
+    def wrapper(execute, sql, params, many, context):
+        sleep(latency)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install, weak=False)
+    for connection in connections.all():
+        install(connection)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность синхронного (WSGI) и '
+        'асинхронного (ASGI) режимов на эндпоинтах чтения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число потоков, имитирующих синхронные воркеры',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=50,
+            help='Число одновременных запросов в режиме ASGI',
+        )
+        parser.add_argument(
+            '--db-latency', type=float, default=5,
+            help='Искусственная задержка каждого SQL-запроса, мс',
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Отключить кэш API, чтобы каждый запрос шёл в базу',
+        )
+        parser.add_argument('--output')
+        parser.add_argument(
+            '--mode', choices=('wsgi', 'asgi'),
+            help='Запустить замер только в одном режиме',
+        )
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            result = self.run_mode(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        results = {}
+        for mode in ('wsgi', 'asgi'):
+            results[mode] = self.run_subprocess(mode, options)
+            self.stdout.write(
+                f'{mode}: {results[mode]["rps"]} запросов/с, '
+                f'p50 {results[mode]["latency_ms"]["p50"]} мс, '
+                f'p95 {results[mode]["latency_ms"]["p95"]} мс, '
+                f'ответы {results[mode]["status"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+
+    def run_subprocess(self, mode, options):
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_asgi', '--mode', mode,
+            '--requests', str(options['requests']),
+            '--workers', str(options['workers']),
+            '--concurrency', str(options['concurrency']),
+            '--db-latency', str(options['db_latency']),
+        ]
+        env = {**os.environ, 'SERVER_MODE': mode}
+        if options['no_cache']:
+            env['CACHE_BACKEND'] = DUMMY_CACHE
+        process = subprocess.run(
+            command, capture_output=True, text=True, env=env
+        )
+        if process.returncode:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def get_paths(self):
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        ingredient = Ingredient.objects.first()
+        if recipe is None or ingredient is None:
+            raise CommandError('Недостаточно данных, выполните seed_data')
+        return (
+            '/api/tags/',
+            f'/api/ingredients/?name={quote(ingredient.name[:3])}',
+            '/api/recipes/?page=1&limit=6',
+            f'/api/recipes/{recipe.id}/',
+        )
+
+    def run_mode(self, options):
+        expected = 'asgi' if options['mode'] == 'asgi' else 'wsgi'
+        if settings.SERVER_MODE != expected:
+            raise CommandError(f'Запустите с SERVER_MODE={expected}')
+        paths = list(islice(cycle(self.get_paths()), options['requests']))
+        add_latency(options['db_latency'] / 1000)
+
+        started = perf_counter()
+        if options['mode'] == 'asgi':
+            measured = asyncio.run(self.run_asgi(paths, options))
+        else:
+            measured = self.run_wsgi(paths, options)
+        elapsed = perf_counter() - started
+
+        latency = latency_percentiles(
+            [timing for timing, _ in measured], PERCENTILES
+        )
+        return {
+            'requests': len(paths),
+            'parallelism': options[
+                'concurrency' if options['mode'] == 'asgi' else 'workers'
+            ],
+            'db_latency_ms': options['db_latency'],
+            'seconds': round(elapsed, 3),
+            'rps': round(len(paths) / elapsed, 1),
+            'latency_ms': latency,
+            'status': sorted({status for _, status in measured}),
+        }
+
+    def run_wsgi(self, paths, options):
+        application = get_wsgi_application()
+
+        def request(path):
+            started = perf_counter()
+            status, _ = wsgi_request(application, path)
+            return (perf_counter() - started) * 1000, status
+
+        with ThreadPoolExecutor(options['workers']) as executor:
+            return list(executor.map(request, paths))
+
+    async def run_asgi(self, paths, options):
+        application = get_asgi_application()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def request(path):
+            async with semaphore:
+                started = perf_counter()
+                status, _ = await asgi_get(application, path)
+                return (perf_counter() - started) * 1000, status
+
+        return await asyncio.gather(*(request(path) for path in paths))
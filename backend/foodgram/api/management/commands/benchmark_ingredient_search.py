@@ -0,0 +1,55 @@
+from statistics import mean, median
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.index import ingredient_index
+from recipes.models import Ingredient
+
+from api.search import get_search_candidates, search_database
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск ингредиентов через ORM и через индекс в памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=3)
+        parser.add_argument('--queries', type=int, default=500)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError(
+                'Каталог ингредиентов пуст, загрузите data/ingredients.json'
+            )
+        step = max(len(names) // options['queries'], 1)
+        queries = [
+            name.lower()[start:start + length]
+            for name in names[::step]
+            for start, length in ((0, 1), (0, 3), (1, 4))
+            if name[start:start + length]
+        ]
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        queryset = Ingredient.objects.all()
+        ingredient_index.get_data()
+
+        backends = (
+            ('orm', lambda c: list(search_database(queryset, c, limit))),
+            ('index', lambda c: ingredient_index.search(c, limit)),
+        )
+        for label, search in backends:
+            timings = []
+            for _ in range(options['rounds']):
+                for query in queries:
+                    candidates = get_search_candidates(query)
+                    started = perf_counter()
+                    search(candidates)
+                    timings.append((perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f'{label}: {len(timings)} запросов, '
+                f'среднее {mean(timings):.3f} мс, '
+                f'медиана {median(timings):.3f} мс, '
+                f'p95 {timings[int(len(timings) * 0.95)]:.3f} мс'
+            )
@@ -0,0 +1,233 @@
+import base64
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db.models.signals import post_save
+from django.test.utils import override_settings
+
+from api.management.benchmarking import latency_percentiles, wsgi_request
+from PIL import Image
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.signals import render_recipe_image
+from rest_framework.authtoken.models import Token
+from users.models import MyUser
+
+PERCENTILES = (50, 95)
+BASE64_CHUNK = 3 * 1024 * 1024
+STREAM_CHUNK = 1024 * 1024
+MANIFEST = 'manifest.json'
+
+
+def get_max_rss():
+    """Пиковый RSS процесса в мегабайтах (Linux отдаёт килобайты)."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        usage //= 1024
+    return usage / 1024
+
+
+def create_image(path, size_mb):
+    """PNG из шума: сжимается плохо, поэтому файл почти равен size_mb."""
+    side = int(math.sqrt(size_mb * 1024 * 1024 / 3))
+    Image.frombytes('RGB', (side, side), os.urandom(side * side * 3)).save(
+        path, 'PNG', compress_level=0
+    )
+
+
+def copy_file(source, target, encode=None):
+    chunk_size = BASE64_CHUNK if encode else STREAM_CHUNK
+    with open(source, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            target.write(encode(chunk) if encode else chunk)
+
+
+def write_base64_body(image, path, fields):
+    """Тело JSON, как его отправляет фронтенд: картинка в data URI."""
+    head, tail = json.dumps({**fields, 'image': '\0'}).split('"\\u0000"')
+    with open(path, 'wb') as body:
+        body.write(f'{head}"data:image/png;base64,'.encode())
+        copy_file(image, body, base64.b64encode)
+        body.write(f'"{tail}'.encode())
+    return 'application/json'
+
+
+def write_multipart_body(image, path, fields):
+    boundary = uuid4().hex
+    with open(path, 'wb') as body:
+        for name, value in fields.items():
+            values = value if name == 'tags' else [value]
+            for item in values:
+                if not isinstance(item, str):
+                    item = json.dumps(item)
+                body.write(
+                    f'--{boundary}\r\nContent-Disposition: form-data; '
+                    f'name="{name}"\r\n\r\n{item}\r\n'.encode()
+                )
+        body.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="image"; '
+            f'filename="image.png"\r\nContent-Type: image/png\r\n\r\n'.encode()
+        )
+        copy_file(image, body)
+        body.write(f'\r\n--{boundary}--\r\n'.encode())
+    return f'multipart/form-data; boundary={boundary}'
+
+
+BODY_WRITERS = {
+    'base64': write_base64_body,
+    'multipart': write_multipart_body,
+}
+
+
+def wsgi_post(application, path, body, content_type, token):
+    with open(body, 'rb') as stream:
+        return wsgi_request(
+            application, path, 'POST', stream,
+            CONTENT_TYPE=content_type,
+            CONTENT_LENGTH=str(os.path.getsize(body)),
+            HTTP_AUTHORIZATION=f'Token {token}',
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку и пиковую память при загрузке изображения '
+        'рецепта в base64 и через multipart/form-data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=float, default=10, help='МБ')
+        parser.add_argument('--requests', type=int, default=5)
+        parser.add_argument('--output')
+        parser.add_argument(
+            '--tracemalloc', action='store_true',
+            help='Дополнительно считать пик памяти Python (замедляет запросы)',
+        )
+        parser.add_argument(
+            '--mode', choices=tuple(BODY_WRITERS),
+            help='Служебный: замер одного способа в отдельном процессе',
+        )
+        parser.add_argument('--bodies', help='Служебный: каталог с телами')
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            self.stdout.write(json.dumps(self.run_mode(options)))
+            return
+
+        fields = self.get_fields()
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for mode, write_body in BODY_WRITERS.items():
+                bodies = os.path.join(directory, mode)
+                os.mkdir(bodies)
+                manifest = []
+                for number in range(options['requests']):
+                    image = os.path.join(directory, 'image.png')
+                    create_image(image, options['size'])
+                    body = os.path.join(bodies, str(number))
+                    manifest.append((body, write_body(
+                        image, body,
+                        {**fields, 'name': f'Замер загрузки {uuid4().hex}'},
+                    )))
+                with open(os.path.join(bodies, MANIFEST), 'w') as file:
+                    json.dump(manifest, file)
+                results[mode] = self.run_subprocess(mode, bodies, options)
+                self.stdout.write(
+                    f'{mode}: p50 {results[mode]["latency_ms"]["p50"]} мс, '
+                    f'рост пикового RSS {results[mode]["rss_growth_mb"]} МБ, '
+                    f'тело {results[mode]["body_mb"]} МБ, '
+                    f'ответы {results[mode]["status"]}'
+                )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+
+    def get_fields(self):
+        tag = Tag.objects.first()
+        ingredient = Ingredient.objects.first()
+        if tag is None or ingredient is None:
+            raise CommandError('Недостаточно данных, выполните seed_data')
+        return {
+            'text': 'Рецепт создан командой benchmark_upload',
+            'cooking_time': 1,
+            'tags': [tag.id],
+            'ingredients': [{'id': ingredient.id, 'amount': 1}],
+        }
+
+    def run_subprocess(self, mode, bodies, options):
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_upload', '--mode', mode,
+            '--bodies', bodies,
+        ]
+        if options['tracemalloc']:
+            command.append('--tracemalloc')
+        env = {
+            **os.environ,
+            'DATA_UPLOAD_MAX_MEMORY_SIZE': str(
+                int(options['size'] * 2 * 1024 * 1024)
+            ),
+        }
+        process = subprocess.run(
+            command, capture_output=True, text=True, env=env
+        )
+        if process.returncode:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def run_mode(self, options):
+        user = MyUser.objects.filter(is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError('Пользователь для замеров не найден')
+        token, _ = Token.objects.get_or_create(user=user)
+        with open(os.path.join(options['bodies'], MANIFEST)) as file:
+            bodies = json.load(file)
+
+        post_save.disconnect(render_recipe_image, sender=Recipe)
+        application = get_wsgi_application()
+        with tempfile.TemporaryDirectory() as media:
+            with override_settings(MEDIA_ROOT=media):
+                return self.measure(
+                    application, bodies, token.key, options
+                )
+
+    def measure(self, application, bodies, token, options):
+        timings = []
+        statuses = set()
+        created = []
+        rss_before = get_max_rss()
+        if options['tracemalloc']:
+            tracemalloc.start()
+        for body, content_type in bodies:
+            started = perf_counter()
+            status, content = wsgi_post(
+                application, '/api/recipes/', body, content_type, token
+            )
+            timings.append((perf_counter() - started) * 1000)
+            statuses.add(status)
+            if status == 201:
+                created.append(json.loads(content)['id'])
+        result = {
+            'requests': len(bodies),
+            'body_mb': round(
+                os.path.getsize(bodies[0][0]) / 1024 / 1024, 2
+            ) if bodies else None,
+            'status': sorted(statuses),
+            'latency_ms': latency_percentiles(timings, PERCENTILES),
+            'rss_growth_mb': round(get_max_rss() - rss_before, 1),
+        }
+        if options['tracemalloc']:
+            result['python_peak_mb'] = round(
+                tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1
+            )
+            tracemalloc.stop()
+        Recipe.objects.filter(id__in=created).delete()
+        return result
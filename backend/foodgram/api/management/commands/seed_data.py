@@ -0,0 +1,195 @@
+from io import BytesIO
+from random import Random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from PIL import Image
+from recipes.counters import recount_counters
+from recipes.models import (AmountIngredient, Ingredient, Recipe, RecipeEvent,
+                            Tag)
+
+from api.cache import bump_version
+
+User = get_user_model()
+
+SEED_IMAGE = 'recipe_images/seed.png'
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, подписками, '
+        'рецептами, избранным и списками покупок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--carts', type=int, default=5)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить пользователей, созданных предыдущим запуском',
+        )
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'Каталог ингредиентов пуст, выполните import_catalog'
+            )
+        self.random = Random(options['random_seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        with transaction.atomic():
+            if options['clear']:
+                deleted, _ = User.objects.filter(
+                    username__startswith=prefix
+                ).delete()
+                self.stdout.write(f'Удалено объектов: {deleted}')
+            users = self.create_users(options)
+            tags = self.create_tags(options)
+            recipes = self.create_recipes(users, options)
+            self.create_relations(
+                users, tags, recipes, ingredient_ids, options
+            )
+            recount_counters(Recipe, User)
+
+        for namespace in ('recipes', 'tags'):
+            bump_version(namespace)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {len(users)} пользователей, {len(recipes)} рецептов'
+        ))
+
+    def create_users(self, options):
+        prefix = options['prefix']
+        password = make_password(options['password'])
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{prefix}{number:06d}',
+                    email=f'{prefix}{number:06d}@example.com',
+                    first_name=f'Имя {number}',
+                    last_name=f'Фамилия {number}',
+                    password=password,
+                )
+                for number in range(options['users'])
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('id', flat=True))
+
+    def create_tags(self, options):
+        prefix = options['prefix']
+        Tag.objects.bulk_create(
+            (
+                Tag(
+                    name=f'{prefix} тег {number}',
+                    color=f'{self.random.randrange(0x1000000):06X}',
+                    slug=f'{prefix}-{number}',
+                )
+                for number in range(options['tags'])
+            ),
+            ignore_conflicts=True,
+        )
+        return list(Tag.objects.filter(
+            slug__startswith=f'{prefix}-'
+        ).values_list('id', flat=True))
+
+    def get_image(self):
+        if not default_storage.exists(SEED_IMAGE):
+            buffer = BytesIO()
+            Image.new('RGB', (64, 64), (220, 120, 40)).save(buffer, 'PNG')
+            default_storage.save(SEED_IMAGE, ContentFile(buffer.getvalue()))
+        return SEED_IMAGE
+
+    def create_recipes(self, users, options):
+        if not users:
+            return []
+        image = self.get_image()
+        existing = set(Recipe.objects.values_list('id', flat=True))
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f'Рецепт {number}',
+                    author_id=self.random.choice(users),
+                    text=f'Описание рецепта {number}',
+                    cooking_time=self.random.randint(1, 180),
+                    image=image,
+                )
+                for number in range(options['recipes'])
+            ),
+            batch_size=self.batch_size,
+        )
+        return [
+            recipe_id
+            for recipe_id in Recipe.objects.filter(
+                author__in=users
+            ).values_list('id', flat=True)
+            if recipe_id not in existing
+        ]
+
+    def sample(self, population, size):
+        return self.random.sample(population, min(size, len(population)))
+
+    def create_relations(self, users, tags, recipes, ingredients, options):
+        self.bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in self.sample(tags, options['tags_per_recipe'])
+        ))
+        self.bulk_create(AmountIngredient, (
+            AmountIngredient(
+                recipe_id=recipe,
+                ingredients_id=ingredient,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe in recipes
+            for ingredient in self.sample(
+                ingredients, options['ingredients_per_recipe']
+            )
+        ))
+        self.bulk_create(User.subscribe.through, (
+            User.subscribe.through(from_myuser_id=user, to_myuser_id=author)
+            for user in users
+            for author in self.sample(users, options['subscriptions'])
+            if author != user
+        ))
+        for relation, kind, size in (
+            (Recipe.favorite, RecipeEvent.FAVORITE, options['favorites']),
+            (Recipe.cart, RecipeEvent.SHOPPING_CART, options['carts']),
+        ):
+            rows = [
+                (user, recipe)
+                for user in users
+                for recipe in self.sample(recipes, size)
+            ]
+            self.bulk_create(relation.through, (
+                relation.through(recipe_id=recipe, myuser_id=user)
+                for user, recipe in rows
+            ))
+            self.bulk_create(RecipeEvent, (
+                RecipeEvent(recipe_id=recipe, kind=kind)
+                for _, recipe in rows
+            ))
+
+    def bulk_create(self, model, objects):
+        model.objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True
+        )
@@ -1,13 +1,37 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 
+from foodgram.routers import primary_reads, replica_reads
+from recipes.models import RecipeEvent
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework import status
 
+from .cache import (get_cache, get_validators, get_version,
+                    invalidate_user_flags, response_key, set_cache_headers)
+from .services import delete_links, get_ids_validate, insert_links
+
 
 class AddDelViewMixin:
 
     add_serializer = None
 
+    def get_relation(self, user, name):
+        relations = {
+            'subscribe': (user.subscribe, 'subscribers_count', None),
+            'favorite': (
+                user.favorites, 'favorites_count', RecipeEvent.FAVORITE
+            ),
+            'shopping_cart': (
+                user.carts, 'in_carts_count', RecipeEvent.SHOPPING_CART
+            ),
+        }
+        return relations[name]
+
     def add_del_obj(self, obj_id, dict):
         assert self.add_serializer is not None, (
             f'{self.__class__.__name__} should include '
@@ -18,24 +42,139 @@ class AddDelViewMixin:
         if user.is_anonymous:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        dicts = {
-            'subscribe': user.subscribe,
-            'favorite': user.favorites,
-            'shopping_cart': user.carts,
-        }
-        dict = dicts[dict]
-
         obj = get_object_or_404(self.queryset, id=obj_id)
+        adding = self.request.method in ('GET', 'POST',)
+        if not self.change_links(user, dict, [obj.id], adding):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if not adding:
+            return Response(status=status.HTTP_204_NO_CONTENT)
         serializer = self.add_serializer(
             obj, context={'request': self.request}
         )
-        obj_exist = dict.filter(id=obj_id).exists()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        if (self.request.method in ('GET', 'POST',)) and not obj_exist:
-            dict.add(obj)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def add_del_objs(self, name):
+        """Добавляет или удаляет список id (`{"ids": [...]}`) за один раз.
 
-        if (self.request.method in ('DELETE',)) and obj_exist:
-            dict.remove(obj)
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        Для каждого id возвращается свой результат, поэтому один
+        отсутствующий рецепт не проваливает весь запрос.
+        """
+        user = self.request.user
+        if user.is_anonymous:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        ids = get_ids_validate(self.request.data)
+        found = set(
+            self.queryset.filter(id__in=ids).values_list('id', flat=True)
+        )
+        adding = self.request.method == 'POST'
+        changed = self.change_links(user, name, found, adding)
+
+        statuses = ('removed', 'absent')
+        if adding:
+            statuses = ('added', 'exists')
+        return Response({'results': [
+            {
+                'id': obj_id,
+                'status': (
+                    'not_found' if obj_id not in found
+                    else statuses[obj_id not in changed]
+                ),
+            }
+            for obj_id in ids
+        ]})
+
+    def change_links(self, user, name, ids, adding):
+        """Добавляет или удаляет связи одной записью в промежуточную таблицу.
+
+        База сама сообщает, какие строки она вставила или удалила, поэтому
+        одновременные повторные нажатия не падают на уникальном индексе и
+        не засчитывают одну связь дважды.
+        """
+        if not ids:
+            return set()
+        manager, counter, event = self.get_relation(user, name)
+        with transaction.atomic():
+            if adding:
+                changed = insert_links(manager, list(ids))
+            else:
+                changed = delete_links(manager, list(ids))
+            if not changed:
+                return changed
+            counted = self.queryset.model.objects.filter(id__in=changed)
+            if adding:
+                counted.update(**{counter: F(counter) + 1})
+            else:
+                counted.update(**{counter: Greatest(F(counter) - 1, 0)})
+            if event is not None:
+                RecipeEvent.objects.bulk_create(
+                    RecipeEvent(
+                        recipe_id=obj_id, kind=event, value=1 if adding else -1
+                    )
+                    for obj_id in changed
+                )
+        invalidate_user_flags(user)
+        return changed
+
+
+class CachedResponseMixin:
+
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        assert self.cache_namespace is not None, (
+            f'{self.__class__.__name__} should include '
+            'a `cache_namespace` attribute.'
+        )
+
+        version = get_version(self.cache_namespace)
+        key = response_key(
+            self.cache_namespace, version, request,
+            request.accepted_renderer.format,
+        )
+        etag, last_modified = get_validators(key, version)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            cache = get_cache()
+            data = cache.get(key)
+            if data is None:
+                with primary_reads():
+                    response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+
+        set_cache_headers(response, etag, last_modified)
+        return response
+
+
+class ReplicaReadMixin:
+
+    replica_actions = ('list', 'retrieve',)
+
+    def dispatch(self, request, *args, **kwargs):
+        token = replica_reads.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        replica_reads.set(
+            request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+        )
@@ -1,5 +1,246 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from foodgram.routers import primary_reads
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .cache import encode_params, get_cache, get_version, make_key
+
+
+class EstimatedPage(Page):
+    def __init__(self, object_list, number, paginator, next_exists):
+        super().__init__(object_list, number, paginator)
+        self.next_exists = next_exists
+
+    def has_next(self):
+        return self.next_exists
+
+
+class CountedPaginator(Paginator):
+    """Paginator whose count may be a table estimate.
+
+    The estimate is only reported: whether a page exists and whether
+    there is a next one is decided by fetching one row past the page,
+    so a low estimate does not hide deep pages.
+    """
+
+    def __init__(self, object_list, per_page, count_func, is_estimate,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+        self.is_estimate = is_estimate
+
+    @cached_property
+    def count(self):
+        return self.count_func(self.object_list)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.is_estimate() or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.is_estimate():
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        self.count = max(self.count, bottom + len(rows))
+        self.__dict__.pop('num_pages', None)
+        return EstimatedPage(
+            rows[:self.per_page], number, self, len(rows) > self.per_page
+        )
 
 
 class PageNumberPaginatorModified(PageNumberPagination):
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_page_size = 6
+    invalid_cursor_message = 'Неверный курсор'
+    count_strategy_header = 'X-Count-Strategy'
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountedPaginator(
+            queryset, page_size, self.get_count,
+            lambda: self.count_strategy == 'estimate',
+        )
+
+    def get_count(self, queryset):
+        params = set(self.request.query_params) - {
+            self.page_query_param, self.page_size_query_param
+        }
+        exact_limit = settings.PAGINATION_COUNT_EXACT_LIMIT
+
+        if not params and self.use_count_estimate():
+            estimate = self.get_count_estimate(queryset)
+            if estimate is not None and estimate > exact_limit:
+                self.count_strategy = 'estimate'
+                return estimate
+
+        cache_key = self.get_count_cache_key(params)
+        if cache_key is not None:
+            count = get_cache().get(cache_key)
+            if count is not None:
+                self.count_strategy = 'cached'
+                return count
+
+        self.count_strategy = 'exact'
+        count = queryset[:exact_limit + 1].count()
+        if count <= exact_limit:
+            return count
+        if cache_key is None:
+            return queryset.count()
+        with primary_reads():
+            count = queryset.count()
+        get_cache().set(
+            cache_key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        )
+        return count
+
+    def use_count_estimate(self):
+        # The table estimate only describes the unfiltered feed; extra
+        # actions such as `popular` paginate a subset of the table.
+        return (
+            getattr(self.view, 'count_estimate', False)
+            and getattr(self.view, 'action', None) == 'list'
+        )
+
+    def get_count_estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                (queryset.model._meta.db_table,)
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+    def get_count_cache_key(self, params):
+        namespace = getattr(self.view, 'cache_namespace', None)
+        cache_params = getattr(self.view, 'count_cache_params', ())
+        if namespace is None or params - set(cache_params):
+            return None
+        return make_key(
+            'count', namespace, get_version(namespace),
+            self.request.path,
+            encode_params(self.request.query_params, cache_params),
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        self.request = request
+        self.count_strategy = None
+        self.cursor_ordering = getattr(view, 'cursor_ordering', None)
+        self.use_cursor = bool(
+            self.cursor_ordering
+            and self.cursor_query_param in request.query_params
+            and self.use_cursor_for_action()
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_queryset_by_cursor(queryset, request)
+
+    def use_cursor_for_action(self):
+        # `cursor_ordering` replaces the queryset ordering, so actions
+        # with their own order (such as `popular`) keep page numbers.
+        actions = getattr(self.view, 'cursor_actions', None)
+        return actions is None or getattr(self.view, 'action', None) in actions
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request) or self.cursor_page_size
+        fields = [field.lstrip('-') for field in self.cursor_ordering]
+
+        queryset = queryset.order_by(*self.cursor_ordering)
+        position = self.decode_cursor(request, queryset.model, fields)
+        if position:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        page = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_position = [
+                getattr(page[-1], field) for field in fields
+            ]
+        return page
+
+    def get_keyset_filter(self, position):
+        conditions = []
+        for index, field in enumerate(self.cursor_ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                previous.lstrip('-'): position[previous.lstrip('-')]
+                for previous in self.cursor_ordering[:index]
+            }
+            conditions.append(
+                Q(**equal, **{f'{name}__{lookup}': position[name]})
+            )
+        return reduce(or_, conditions)
+
+    def decode_cursor(self, request, model, fields):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return {
+                field: model._meta.get_field(field).to_python(value)
+                for field, value in zip(fields, values)
+            }
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in position
+        ]
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            response = super().get_paginated_response(data)
+            response[self.count_strategy_header] = self.count_strategy
+            return response
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,116 @@
+import csv
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+
+from rest_framework.renderers import BaseRenderer
+
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+def spool(chunks):
+    buffer = SpooledTemporaryFile(max_size=PDF_CHUNK_SIZE * 16)
+    for chunk in chunks:
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+    def stream(self, rows, user):
+        raise NotImplementedError(
+            'ShoppingListRenderer subclasses must implement `stream()`.'
+        )
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows, user):
+        yield f'Список покупок для:\n\n{user.first_name}\n\n'.encode(
+            self.charset
+        )
+        for row in rows:
+            yield (
+                f'{row["ingredient"]}: {row["amount"]} {row["measure"]}\n'
+            ).encode(self.charset)
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows, user):
+        writer = csv.writer(Echo())
+        yield '\ufeff'.encode(self.charset)
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        ).encode(self.charset)
+        for row in rows:
+            yield writer.writerow(
+                (row['ingredient'], row['amount'], row['measure'])
+            ).encode(self.charset)
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    font_size = 12
+    margin = 50
+
+    def get_font(self):
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if not os.path.exists(font_path):
+            return 'Helvetica'
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+        return PDF_FONT_NAME
+
+    def stream(self, rows, user):
+        width, height = A4
+        font = self.get_font()
+        line_height = self.font_size * 1.5
+        with SpooledTemporaryFile(max_size=PDF_CHUNK_SIZE * 16) as buffer:
+            canvas = Canvas(buffer, pagesize=A4)
+            canvas.setFont(font, self.font_size)
+            lines = (
+                f'{row["ingredient"]}: {row["amount"]} {row["measure"]}'
+                for row in rows
+            )
+            y = height - self.margin
+            canvas.drawString(
+                self.margin, y, f'Список покупок для: {user.first_name}'
+            )
+            y -= line_height * 2
+            for line in lines:
+                if y < self.margin:
+                    canvas.showPage()
+                    canvas.setFont(font, self.font_size)
+                    y = height - self.margin
+                canvas.drawString(self.margin, y, line)
+                y -= line_height
+            canvas.save()
+            buffer.seek(0)
+            yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
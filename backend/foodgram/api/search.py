@@ -0,0 +1,49 @@
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.db.models import Case, Q, Value, When
+from django.db.models.functions import Lower
+
+from recipes.index import ingredient_index
+
+incorrect_layout = str.maketrans(
+    'qwertyuiop[]asdfghjkl;\'zxcvbnm,./',
+    'йцукенгшщзхъфывапролджэячсмитьбю.'
+)
+
+
+def get_search_candidates(name):
+    if name[0] == '%':
+        name = unquote(name)
+    name = name.lower()
+    candidates = [name]
+    translated = name.translate(incorrect_layout)
+    if translated != name:
+        candidates.append(translated)
+    return candidates
+
+
+def search_database(queryset, candidates, limit):
+    matches = Q()
+    for candidate in candidates:
+        matches |= Q(lower_name__contains=candidate)
+    search_rank = Case(
+        *(
+            When(lower_name__startswith=candidate, then=Value(rank))
+            for rank, candidate in enumerate(candidates)
+        ),
+        default=Value(len(candidates)),
+    )
+    return queryset.alias(
+        lower_name=Lower('name')
+    ).filter(matches).alias(
+        search_rank=search_rank
+    ).order_by('search_rank', 'name')[:limit]
+
+
+def search_ingredients(queryset, name):
+    candidates = get_search_candidates(name)
+    limit = settings.INGREDIENT_SEARCH_LIMIT
+    if settings.INGREDIENT_INDEX_ENABLED:
+        return ingredient_index.search(candidates, limit)
+    return search_database(queryset, candidates, limit)
@@ -1,23 +1,29 @@
 from django.contrib.auth import get_user_model
-from django.db.models import F
-
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 
 from recipes.models import Ingredient, Recipe, Tag
 
 from rest_framework.serializers import (ModelSerializer, SerializerMethodField,
                                         ValidationError)
 
-from .services import (check_value_validate,
-                       calc_ingredients_amount)
+from .fields import HashedImageField
+from .services import (calc_ingredients_amount, get_ingredients_validate,
+                       get_list_data, get_objects_validate,
+                       get_recipes_limit, get_rendition_urls,
+                       sync_ingredients_amount)
 
 User = get_user_model()
 
 
 class RecipeShortSerializer(ModelSerializer):
+    image_renditions = SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = 'id', 'name', 'image', 'cooking_time'
+        fields = 'id', 'name', 'image', 'image_renditions', 'cooking_time'
+
+    def get_image_renditions(self, obj):
+        return get_rendition_urls(obj, self.context.get('request'))
 
 
 class UserSerializer(ModelSerializer):
@@ -36,6 +42,8 @@ class UserSerializer(ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous or (user == obj):
             return False
@@ -54,8 +62,7 @@ class UserSerializer(ModelSerializer):
 
 
 class UserSubscribeSerializer(UserSerializer):
-    recipes = RecipeShortSerializer(many=True, read_only=True)
-    recipes_count = SerializerMethodField()
+    recipes = SerializerMethodField()
 
     class Meta:
         model = User
@@ -66,8 +73,14 @@ class UserSubscribeSerializer(UserSerializer):
     def get_is_subscribed(*args):
         return True
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+    def get_recipes(self, obj):
+        recipes = obj.recipes.all()
+        recipes_limit = get_recipes_limit(self.context.get('request'))
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+        return RecipeShortSerializer(
+            recipes, many=True, context=self.context
+        ).data
 
 
 class TagSerializer(ModelSerializer):
@@ -88,27 +101,50 @@ class RecipeSerializer(ModelSerializer):
     ingredients = SerializerMethodField()
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
-    image = Base64ImageField()
+    image = HashedImageField()
+    image_renditions = SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time')
+                  'image', 'image_renditions', 'text', 'cooking_time')
 
     def get_ingredients(self, obj):
-        ingredients = obj.ingredients.values(
-            'id', 'name', 'measurement_unit', amount=F('recipe__amount')
-        )
-        return ingredients
+        amounts = obj.ingredient.all()
+        if 'ingredient' not in getattr(obj, '_prefetched_objects_cache', {}):
+            amounts = amounts.select_related(
+                'ingredients'
+            ).order_by('ingredients__name')
+        return [
+            {
+                'id': amount.ingredients.id,
+                'name': amount.ingredients.name,
+                'measurement_unit': amount.ingredients.measurement_unit,
+                'amount': amount.amount,
+            }
+            for amount in amounts
+        ]
+
+    def to_representation(self, obj):
+        if hasattr(obj, 'author_is_subscribed'):
+            obj.author.is_subscribed = obj.author_is_subscribed
+        return super().to_representation(obj)
+
+    def get_image_renditions(self, obj):
+        return get_rendition_urls(obj, self.context.get('request'))
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return user.favorites.filter(id=obj.id).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -116,8 +152,8 @@ class RecipeSerializer(ModelSerializer):
 
     def validate(self, data):
         name = str(self.initial_data.get('name')).strip()
-        tags = self.initial_data.get('tags')
-        ingredients = self.initial_data.get('ingredients')
+        tags = get_list_data(self.initial_data, 'tags')
+        ingredients = get_list_data(self.initial_data, 'ingredients')
         values_as_list = (tags, ingredients)
 
         for value in values_as_list:
@@ -126,27 +162,25 @@ class RecipeSerializer(ModelSerializer):
                     f'"{value}" должен быть в формате "[]"'
                 )
 
-        for tag in tags:
-            check_value_validate(tag, Tag)
-
-        valid_ingredients = []
-        for ing in ingredients:
-            ing_id = ing.get('id')
-            ingredient = check_value_validate(ing_id, Ingredient)
-
-            amount = ing.get('amount')
-            check_value_validate(amount)
-
-            valid_ingredients.append(
-                {'ingredient': ingredient, 'amount': amount}
-            )
+        errors = {}
+        tag_objects, tag_errors = get_objects_validate(tags, Tag)
+        if tag_errors:
+            errors['tags'] = tag_errors
+        valid_ingredients, ingredient_errors = get_ingredients_validate(
+            ingredients
+        )
+        if ingredient_errors:
+            errors['ingredients'] = ingredient_errors
+        if errors:
+            raise ValidationError(errors)
 
         data['name'] = name.capitalize()
-        data['tags'] = tags
+        data['tags'] = [tag_objects[int(tag)] for tag in tags]
         data['ingredients'] = valid_ingredients
         data['author'] = self.context.get('request').user
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         image = validated_data.pop('image')
         tags = validated_data.pop('tags')
@@ -156,6 +190,7 @@ class RecipeSerializer(ModelSerializer):
         calc_ingredients_amount(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         tags = validated_data.get('tags')
         ingredients = validated_data.get('ingredients')
@@ -170,12 +205,10 @@ class RecipeSerializer(ModelSerializer):
             'cooking_time', recipe.cooking_time)
 
         if tags:
-            recipe.tags.clear()
             recipe.tags.set(tags)
 
         if ingredients:
-            recipe.ingredients.clear()
-            calc_ingredients_amount(recipe, ingredients)
+            sync_ingredients_amount(recipe, ingredients)
 
         recipe.save()
         return recipe
@@ -1,30 +1,336 @@
-from recipes.models import AmountIngredient
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import (Exists, F, OuterRef, Prefetch, Subquery, Sum,
+                              Value)
+
+from recipes.models import AmountIngredient, Ingredient, Recipe, Tag
 
 from rest_framework.serializers import ValidationError
 
+from .cache import get_cache, user_flags_key
+
+User = get_user_model()
+
+
+def annotate_user_flags(queryset, user):
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_favorited=Value(False),
+            is_in_shopping_cart=Value(False),
+            author_is_subscribed=Value(False),
+        )
+    return queryset.annotate(
+        is_favorited=Exists(Recipe.favorite.through.objects.filter(
+            recipe=OuterRef('pk'), myuser=user
+        )),
+        is_in_shopping_cart=Exists(Recipe.cart.through.objects.filter(
+            recipe=OuterRef('pk'), myuser=user
+        )),
+        author_is_subscribed=Exists(User.subscribe.through.objects.filter(
+            from_myuser=user, to_myuser=OuterRef('author')
+        ).exclude(to_myuser=user)),
+    )
+
+
+def get_user_flags(user):
+    cache = get_cache()
+    key = user_flags_key(user.id)
+    flags = cache.get(key)
+    if flags is None:
+        flags = {
+            'favorites': set(Recipe.favorite.through.objects.using(
+                DEFAULT_DB_ALIAS
+            ).filter(myuser=user).values_list('recipe_id', flat=True)),
+            'carts': set(Recipe.cart.through.objects.using(
+                DEFAULT_DB_ALIAS
+            ).filter(myuser=user).values_list('recipe_id', flat=True)),
+            'subscribe': set(User.subscribe.through.objects.using(
+                DEFAULT_DB_ALIAS
+            ).filter(from_myuser=user).exclude(
+                to_myuser=user
+            ).values_list('to_myuser_id', flat=True)),
+        }
+        cache.set(key, flags, settings.API_CACHE_TIMEOUT)
+    return flags
+
+
+def apply_user_flags(data, user):
+    flags = get_user_flags(user)
+    recipes = data['results'] if isinstance(data, dict) else data
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in flags['favorites']
+        recipe['is_in_shopping_cart'] = recipe['id'] in flags['carts']
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in flags['subscribe']
+        )
+
+
+def get_recipe_prefetches():
+    return (
+        Prefetch('tags', queryset=Tag.objects.all()),
+        Prefetch(
+            'ingredient',
+            queryset=AmountIngredient.objects.select_related(
+                'ingredients'
+            ).order_by('ingredients__name'),
+        ),
+    )
+
+
+def prefetch_recipe_relations(queryset):
+    return queryset.select_related('author').prefetch_related(
+        *get_recipe_prefetches()
+    )
+
+
+def filter_recipes(queryset, query_params):
+    tags = query_params.getlist('tags')
+    if tags:
+        queryset = queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__slug__in=tags
+            )
+        ))
+
+    author = query_params.get('author')
+    if author:
+        queryset = queryset.filter(author=author)
+    return queryset
+
+
+def get_rendition_urls(recipe, request):
+    urls = {}
+    for label, names in recipe.image_renditions.items():
+        if label == 'source':
+            continue
+        urls[label] = {
+            extension: default_storage.url(name)
+            for extension, name in names.items()
+        }
+        if request is not None:
+            urls[label] = {
+                extension: request.build_absolute_uri(url)
+                for extension, url in urls[label].items()
+            }
+    return urls
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None or not recipes_limit.isdecimal():
+        return None
+    return int(recipes_limit)
+
+
+def prefetch_author_recipes(queryset, recipes_limit=None):
+    recipes = Recipe.objects.all()
+    if recipes_limit is not None:
+        recipes = recipes.filter(pk__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author')
+            ).values('pk')[:recipes_limit]
+        ))
+    return queryset.prefetch_related(Prefetch('recipes', queryset=recipes))
+
+
+def get_shopping_list(user):
+    return AmountIngredient.objects.filter(
+        recipe__in=user.carts.values('id')
+    ).values(
+        ingredient=F('ingredients__name'),
+        measure=F('ingredients__measurement_unit'),
+    ).annotate(
+        amount=Sum('amount')
+    ).order_by('ingredient', 'measure').iterator(chunk_size=500)
+
 
 def calc_ingredients_amount(recipe, ingredients):
-    for ingredient in ingredients:
-        AmountIngredient.objects.get_or_create(
+    amounts = {
+        ingredient['ingredient'].id: ingredient for ingredient in ingredients
+    }
+    AmountIngredient.objects.bulk_create(
+        AmountIngredient(
             recipe=recipe,
             ingredients=ingredient['ingredient'],
-            amount=ingredient['amount']
+            amount=ingredient['amount'],
         )
+        for ingredient in amounts.values()
+    )
 
 
-def check_value_validate(value, clas=None):
-    if int(value) <= 0:
-        raise ValidationError(
-            'Вес ингредиента: Убедитесь, что это значение больше либо равно 1.'
-        )
+def sync_ingredients_amount(recipe, ingredients):
+    amounts = {
+        ingredient['ingredient'].id: ingredient for ingredient in ingredients
+    }
+    existing = {row.ingredients_id: row for row in recipe.ingredient.all()}
+
+    to_create, to_update = [], []
+    for ingredient_id, ingredient in amounts.items():
+        row = existing.get(ingredient_id)
+        if row is None:
+            to_create.append(AmountIngredient(
+                recipe=recipe,
+                ingredients=ingredient['ingredient'],
+                amount=ingredient['amount'],
+            ))
+        elif row.amount != int(ingredient['amount']):
+            row.amount = ingredient['amount']
+            to_update.append(row)
+    to_delete = [
+        row.id for ingredient_id, row in existing.items()
+        if ingredient_id not in amounts
+    ]
+
+    if to_delete:
+        AmountIngredient.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        AmountIngredient.objects.bulk_update(to_update, ('amount',))
+    if to_create:
+        AmountIngredient.objects.bulk_create(to_create)
+
+
+def execute_links(manager, sql, params):
+    """Выполняет `sql` над промежуточной таблицей связи `manager`.
+
+    `{table}`, `{source}` и `{target}` заменяются на имена таблицы и её
+    столбцов; запрос должен возвращать столбец `{target}` изменённых
+    строк, из него собирается множество id.
+    """
+    through = manager.through
+    connection = connections[router.db_for_write(through)]
+    quote = connection.ops.quote_name
+    sql = sql.format(
+        table=quote(through._meta.db_table),
+        source=quote(
+            through._meta.get_field(manager.source_field_name).column
+        ),
+        target=quote(
+            through._meta.get_field(manager.target_field_name).column
+        ),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def insert_links(manager, ids):
+    """Одна вставка; уже существующие связи пропускает база."""
+    values = ', '.join(['(%s, %s)'] * len(ids))
+    params = []
+    for obj_id in ids:
+        params.extend((manager.instance.pk, obj_id))
+    return execute_links(
+        manager,
+        f'INSERT INTO {{table}} ({{source}}, {{target}}) VALUES {values} '
+        'ON CONFLICT DO NOTHING RETURNING {target}',
+        params,
+    )
+
+
+def delete_links(manager, ids):
+    placeholders = ', '.join(['%s'] * len(ids))
+    return execute_links(
+        manager,
+        'DELETE FROM {table} WHERE {source} = %s '
+        f'AND {{target}} IN ({placeholders}) RETURNING {{target}}',
+        [manager.instance.pk, *ids],
+    )
+
+
+def get_list_data(data, key):
+    """Список из JSON или из multipart-формы.
+
+    В форме список передаётся повторяющимся полем (`tags=1&tags=2`)
+    или одним полем со строкой JSON (`ingredients=[{"id": 1, ...}]`).
+    """
+    if not hasattr(data, 'getlist'):
+        return data.get(key)
+    values = data.getlist(key)
+    if not values:
+        return None
+    if len(values) == 1 and str(values[0]).lstrip().startswith('['):
+        try:
+            return json.loads(values[0])
+        except ValueError:
+            return values[0]
+    return values
+
+
+def check_value_validate(value):
     if not str(value).isdecimal():
         raise ValidationError(
             f'{value} должен содержать цифру'
         )
-    if clas:
-        obj = clas.objects.filter(id=value)
-        if not obj:
+    if int(value) <= 0:
+        raise ValidationError(
+            'Вес ингредиента: Убедитесь, что это значение больше либо равно 1.'
+        )
+
+
+def get_objects_validate(values, model):
+    errors = []
+    ids = []
+    for value in values:
+        if str(value).isdecimal() and int(value) > 0:
+            ids.append(int(value))
+        else:
+            errors.append(f'{value} должен быть положительным числом')
+
+    objects = model.objects.in_bulk(ids)
+    missing = [str(obj_id) for obj_id in ids if obj_id not in objects]
+    if missing:
+        errors.append(f'{", ".join(missing)} не существует')
+    duplicates = [
+        str(obj_id) for obj_id, count in Counter(ids).items() if count > 1
+    ]
+    if duplicates:
+        errors.append(f'{", ".join(duplicates)} указаны несколько раз')
+    return objects, errors
+
+
+def get_ids_validate(data):
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        raise ValidationError({'ids': 'Передайте непустой список id'})
+    if len(ids) > settings.BULK_IDS_LIMIT:
+        raise ValidationError({'ids': (
+            f'Не больше {settings.BULK_IDS_LIMIT} id за один запрос'
+        )})
+    errors = [
+        f'{value} должен быть положительным числом'
+        for value in ids
+        if not str(value).isdecimal() or int(value) <= 0
+    ]
+    if errors:
+        raise ValidationError({'ids': errors})
+    return list(dict.fromkeys(int(value) for value in ids))
+
+
+def get_ingredients_validate(ingredients):
+    for ingredient in ingredients:
+        if not isinstance(ingredient, dict):
             raise ValidationError(
-                f'{value} не существует'
+                f'"{ingredient}" должен быть в формате "{{}}"'
             )
-        return obj[0]
+    objects, errors = get_objects_validate(
+        [ingredient.get('id') for ingredient in ingredients], Ingredient
+    )
+    for ingredient in ingredients:
+        try:
+            check_value_validate(ingredient.get('amount'))
+        except ValidationError as error:
+            errors.extend(error.detail)
+    if errors:
+        return None, errors
+    return [
+        {
+            'ingredient': objects[int(ingredient['id'])],
+            'amount': int(ingredient['amount']),
+        }
+        for ingredient in ingredients
+    ], errors
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token
+from .cache import bump_version
+
+User = get_user_model()
+
+# Fields of the author block in the cached recipe feed.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def invalidate(namespace):
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+def invalidate_recipes():
+    invalidate('recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    invalidate('tags')
+    invalidate_recipes()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    invalidate('ingredients')
+    invalidate_recipes()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(**kwargs):
+    invalidate_recipes()
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(instance, update_fields=None, **kwargs):
+    instance.saved_author_fields = None
+    if instance._state.adding:
+        return
+    if update_fields and not set(update_fields) & set(AUTHOR_FIELDS):
+        return
+    instance.saved_author_fields = User.objects.filter(
+        pk=instance.pk, recipes_count__gt=0
+    ).values(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(instance, **kwargs):
+    saved = getattr(instance, 'saved_author_fields', None)
+    if saved is None:
+        return
+    if any(saved[name] != getattr(instance, name) for name in AUTHOR_FIELDS):
+        invalidate_recipes()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ):
+        invalidate_token(key)
@@ -0,0 +1,645 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.http import FileResponse
+from django.test import (AsyncRequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings,
+                         skipUnlessDBFeature)
+
+from api import async_views
+from api.cache import get_cache, get_version
+from api.paginators import PageNumberPaginatorModified
+from api.views import RecipeViewSet
+from foodgram.routers import (REPLICA_DB_ALIAS, ReplicaRouter, primary_reads,
+                              replica_reads)
+from recipes.admin import IngredientAdmin
+from recipes.models import (AmountIngredient, Ingredient, Recipe,
+                            RecipeRanking, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+User = get_user_model()
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        first_name=username, last_name=username, password='password',
+    )
+
+
+def create_recipes(author, count, image='recipe_images/test.png'):
+    tags = [
+        Tag.objects.create(name=f'Тег {number}', slug=f'tag-{number}')
+        for number in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(name=f'Ингредиент {number}',
+                                  measurement_unit='г')
+        for number in range(3)
+    ]
+    recipes = [
+        Recipe.objects.create(
+            name=f'Рецепт {number}', author=author, image=image,
+            text='Описание', cooking_time=10,
+        )
+        for number in range(count)
+    ]
+    for recipe in recipes:
+        recipe.tags.set(tags)
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(recipe=recipe, ingredients=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+    return recipes
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов к БД на странице рецептов не зависит от её размера."""
+
+    queries = 7
+    annotated_queries = 4
+    detail_queries = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.user = create_user('reader')
+        recipes = create_recipes(author, 60)
+        cls.recipe = recipes[0]
+        cls.user.subscribe.add(author)
+        cls.user.favorites.add(*recipes[:10:2])
+        cls.user.carts.add(*recipes[::3])
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_list_queries(self, path, limit, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(f'{path}limit={limit}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        return response.data['results']
+
+    def test_small_page(self):
+        self.assert_list_queries('/api/recipes/?', 5, self.queries)
+
+    def test_large_page(self):
+        self.assert_list_queries('/api/recipes/?', 50, self.queries)
+
+    def test_annotated_pages(self):
+        for limit in (5, 50):
+            with self.subTest(limit=limit):
+                recipes = self.assert_list_queries(
+                    '/api/recipes/?is_favorited=0&', limit,
+                    self.annotated_queries,
+                )
+                self.assertFalse(any(
+                    recipe['is_favorited'] for recipe in recipes
+                ))
+                self.assertTrue(all(
+                    recipe['author']['is_subscribed'] for recipe in recipes
+                ))
+
+    def test_annotated_detail(self):
+        with self.assertNumQueries(self.detail_queries):
+            response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertTrue(response.data['is_in_shopping_cart'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+
+class AsyncRecipeListTest(TestCase):
+    """Асинхронный список рецептов отвечает так же, как синхронный."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        recipes = create_recipes(create_user('author'), 5)
+        cls.user.favorites.add(recipes[0])
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        get_cache().clear()
+
+    def get_async(self, path, **headers):
+        return async_to_sync(async_views.recipes)(AsyncRequestFactory().get(
+            path, accept='application/json', **headers
+        ))
+
+    def test_cursor_page(self):
+        first = APIClient().get('/api/recipes/?cursor=&limit=2')
+        path = first.data['next'].replace('http://testserver', '')
+        expected = APIClient().get(path).json()
+        get_cache().clear()
+        response = self.get_async(path)
+        self.assertEqual(json.loads(response.content), expected)
+        self.assertEqual(len(expected['results']), 2)
+
+    def test_token_user_flags(self):
+        response = self.get_async(
+            '/api/recipes/?limit=5',
+            authorization=f'Token {self.token.key}',
+        )
+        recipes = json.loads(response.content)['results']
+        self.assertEqual(
+            [recipe['is_favorited'] for recipe in recipes],
+            [False] * 4 + [True],
+        )
+
+    def test_invalid_token(self):
+        response = self.get_async(
+            '/api/recipes/', authorization='Token invalid'
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class ShoppingListExportTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.user.carts.add(*create_recipes(create_user('author'), 2))
+
+    def download(self, format):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(
+            f'/api/recipes/download_shopping_cart/?format={format}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_asgi_builds_file(self):
+        for format in ('txt', 'csv', 'pdf'):
+            with self.subTest(format=format):
+                streamed = self.download(format)
+                with override_settings(SERVER_MODE='asgi'):
+                    response = self.download(format)
+                self.assertIsInstance(response, FileResponse)
+                self.assertEqual(
+                    response['Content-Type'], streamed['Content-Type']
+                )
+                self.assertEqual(
+                    response['Content-Disposition'],
+                    streamed['Content-Disposition'],
+                )
+                content = b''.join(response.streaming_content)
+                expected = b''.join(streamed.streaming_content)
+                if format == 'pdf':
+                    self.assertTrue(content.startswith(b'%PDF'))
+                else:
+                    self.assertEqual(content, expected)
+
+
+class CacheInvalidationTest(TestCase):
+
+    def test_tag_version_bumped_after_commit(self):
+        version = get_version('tags')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Новый', slug='new')
+            self.assertEqual(get_version('tags'), version)
+        self.assertNotEqual(get_version('tags'), version)
+
+    @patch.object(IngredientAdmin, 'message_user')
+    def test_rebuild_search_index_bumps_ingredients(self, message_user):
+        version = get_version('ingredients')
+        IngredientAdmin(Ingredient, admin.site).rebuild_search_index(
+            None, Ingredient.objects.none()
+        )
+        self.assertNotEqual(get_version('ingredients'), version)
+
+    def assert_recipes_bumped(self, bumped, change):
+        version = get_version('recipes')
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertEqual(get_version('recipes') != version, bumped)
+
+    def rename(self, user):
+        user.first_name = 'Другое'
+        user.save()
+
+    def test_author_block_change_bumps_recipes(self):
+        author = create_user('author')
+        create_recipes(author, 1)
+        author.refresh_from_db()
+        self.assert_recipes_bumped(True, lambda: self.rename(author))
+
+    def test_user_changes_keep_recipes(self):
+        author = create_user('author')
+        create_recipes(author, 1)
+        author.refresh_from_db()
+        reader = create_user('reader')
+        self.assert_recipes_bumped(False, lambda: create_user('new'))
+        self.assert_recipes_bumped(False, lambda: self.rename(reader))
+        author.set_password('changed')
+        self.assert_recipes_bumped(False, author.save)
+
+
+class RecipeFilterPlanTest(TestCase):
+    """Фильтры ленты рецептов идут по индексам, а не полным чтением таблиц.
+
+    PostgreSQL на маленьких таблицах всё равно выбирает Seq Scan, поэтому
+    он запрещается для запроса: если подходящего индекса нет, в плане
+    останется Seq Scan. Для SQLite полным чтением считается SCAN без
+    USING INDEX и сортировка во временном B-дереве вместо обхода
+    индекса по дате публикации.
+    """
+
+    filters = (
+        {},
+        {'tags': 'tag-1'},
+        {'tags': ['tag-0', 'tag-2']},
+        {'is_favorited': '1'},
+        {'is_in_shopping_cart': '1'},
+        {'is_favorited': '0', 'is_in_shopping_cart': '0'},
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        author = create_user('author')
+        create_recipes(author, 3)
+        recipes = Recipe.objects.bulk_create(
+            Recipe(name=f'Рецепт {number}', author=cls.user if number % 2
+                   else author, image='recipe_images/test.png',
+                   text='Описание', cooking_time=10)
+            for number in range(3, 2000)
+        )
+        tags = list(Tag.objects.all())
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tags[number % 3])
+            for number, recipe in enumerate(recipes)
+        )
+        Recipe.favorite.through.objects.bulk_create(
+            Recipe.favorite.through(recipe=recipe, myuser=cls.user)
+            for recipe in recipes[::7]
+        )
+        Recipe.cart.through.objects.bulk_create(
+            Recipe.cart.through(recipe=recipe, myuser=cls.user)
+            for recipe in recipes[::11]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def get_plan(self, params):
+        view = RecipeViewSet()
+        view.request = Request(
+            APIRequestFactory().get('/api/recipes/', params)
+        )
+        queryset = view.get_recipes(self.user)[:6]
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assert_no_full_scans(self, plan):
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+        else:
+            self.assertIsNone(
+                re.search(r'\bSCAN \w+( AS \w+)?$', plan, re.MULTILINE),
+                plan,
+            )
+            self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_filters_use_indexes(self):
+        for params in self.filters:
+            with self.subTest(**params):
+                self.assert_no_full_scans(self.get_plan(params))
+
+    def test_author_filter_uses_index(self):
+        plan = self.get_plan({'author': self.user.id})
+        self.assert_no_full_scans(plan)
+
+
+class PopularCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = create_recipes(create_user('author'), 5)
+        RecipeRanking.objects.bulk_create(
+            RecipeRanking(recipe=recipe, window='week', rank=rank, score=1,
+                          favorites=1, carts=0)
+            for rank, recipe in enumerate(cls.recipes[:3], 1)
+        )
+
+    def setUp(self):
+        get_cache().clear()
+
+    @patch.object(PageNumberPaginatorModified, 'get_count_estimate',
+                  return_value=50000)
+    def test_popular_counts_ranked_recipes(self, estimate):
+        response = APIClient().get('/api/recipes/popular/?limit=2')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response['X-Count-Strategy'], 'exact')
+        estimate.assert_not_called()
+
+    def test_popular_ignores_cursor(self):
+        response = APIClient().get('/api/recipes/popular/?cursor=&limit=2')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [recipe.id for recipe in self.recipes[:2]],
+        )
+
+    @patch.object(PageNumberPaginatorModified, 'get_count_estimate',
+                  return_value=50000)
+    def test_list_uses_estimate(self, estimate):
+        response = APIClient().get('/api/recipes/?limit=2')
+        self.assertEqual(response.data['count'], 50000)
+        self.assertEqual(response['X-Count-Strategy'], 'estimate')
+
+
+@override_settings(PAGINATION_COUNT_EXACT_LIMIT=5)
+class EstimatedPagesTest(TestCase):
+    """Заниженная оценка числа рецептов не скрывает дальние страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_recipes(create_user('author'), 60)
+
+    def setUp(self):
+        get_cache().clear()
+        patcher = patch.object(
+            PageNumberPaginatorModified, 'get_count_estimate',
+            return_value=20,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_page(self, page):
+        return APIClient().get(f'/api/recipes/?limit=10&page={page}')
+
+    def test_page_past_estimate(self):
+        response = self.get_page(3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['count'], 31)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(response['X-Count-Strategy'], 'estimate')
+
+    def test_last_page(self):
+        response = self.get_page(6)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(self.get_page(7).status_code, 404)
+
+    def test_first_page_keeps_estimate(self):
+        response = self.get_page(1)
+        self.assertEqual(response.data['count'], 20)
+        self.assertIsNotNone(response.data['next'])
+
+
+@override_settings(PAGINATION_COUNT_EXACT_LIMIT=2)
+class AsyncFeedCountTest(TestCase):
+    """Асинхронная лента считает записи так же, как синхронная."""
+
+    paths = (
+        '/api/recipes/?limit=2',
+        '/api/recipes/?limit=2&page=2',
+        '/api/recipes/?limit=2&tags=tag-1',
+        '/api/recipes/?limit=2&tags=tag-1&page=2',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        create_recipes(create_user('author'), 5)
+
+    def get_sync_counts(self):
+        get_cache().clear()
+        client = APIClient()
+        return [
+            (response.data['count'], response['X-Count-Strategy'])
+            for response in map(client.get, self.paths)
+        ]
+
+    def get_async_counts(self):
+        get_cache().clear()
+        factory = AsyncRequestFactory()
+        counts = []
+        for path in self.paths:
+            response = async_to_sync(async_views.recipes)(
+                factory.get(path, accept='application/json')
+            )
+            counts.append((
+                json.loads(response.content)['count'],
+                response['X-Count-Strategy'],
+            ))
+        return counts
+
+    @patch.object(PageNumberPaginatorModified, 'get_count_estimate',
+                  return_value=50000)
+    def test_count_strategy_matches_sync(self, estimate):
+        counts = self.get_sync_counts()
+        self.assertEqual(counts, [
+            (50000, 'estimate'), (50000, 'estimate'),
+            (5, 'exact'), (5, 'cached'),
+        ])
+        self.assertEqual(self.get_async_counts(), counts)
+
+
+class RecordReadsMixin:
+    """Запоминает модель и флаг чтения с реплики для каждого чтения."""
+
+    def setUp(self):
+        super().setUp()
+        routers = override_settings(
+            DATABASE_ROUTERS=['foodgram.routers.ReplicaRouter']
+        )
+        routers.enable()
+        self.addCleanup(routers.disable)
+        get_cache().clear()
+        self.reads = []
+        patcher = patch.object(
+            ReplicaRouter, 'db_for_read', autospec=True,
+            side_effect=self.record_read,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record_read(self, router, model, **hints):
+        self.reads.append((model, replica_reads.get()))
+
+
+class ReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def read_with_flag(self, flag):
+        token = replica_reads.set(flag)
+        try:
+            return self.router.db_for_read(Recipe)
+        finally:
+            replica_reads.reset(token)
+
+    def test_reads_replica_only_with_flag(self):
+        with patch.dict(settings.DATABASES, {REPLICA_DB_ALIAS: {}}):
+            self.assertEqual(self.read_with_flag(True), REPLICA_DB_ALIAS)
+            self.assertIsNone(self.read_with_flag(False))
+
+    def test_reads_primary_without_replica(self):
+        self.assertNotIn(REPLICA_DB_ALIAS, settings.DATABASES)
+        self.assertIsNone(self.read_with_flag(True))
+
+    def test_primary_reads_clears_flag(self):
+        token = replica_reads.set(True)
+        try:
+            with primary_reads():
+                self.assertFalse(replica_reads.get())
+            self.assertTrue(replica_reads.get())
+        finally:
+            replica_reads.reset(token)
+
+    def test_writes_and_migrations_use_primary(self):
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(
+                self.router.db_for_write(Recipe), DEFAULT_DB_ALIAS
+            )
+        finally:
+            replica_reads.reset(token)
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'api'))
+        self.assertFalse(self.router.allow_migrate(REPLICA_DB_ALIAS, 'api'))
+
+
+class ReplicaReadViewTest(RecordReadsMixin, TestCase):
+    """С реплики читают только безопасные запросы к read-only действиям."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.recipe = create_recipes(create_user('author'), 1)[0]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_recipe_flags(self, method, path):
+        self.reads.clear()
+        getattr(self.client, method)(path, format='json')
+        self.assertFalse(replica_reads.get())
+        return {flag for model, flag in self.reads if model is Recipe}
+
+    def test_read_actions_use_replica(self):
+        for path in ('/api/recipes/?is_favorited=0',
+                     f'/api/recipes/{self.recipe.id}/',
+                     '/api/recipes/popular/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get_recipe_flags('get', path), {True})
+
+    def test_other_actions_use_primary(self):
+        path = f'/api/recipes/{self.recipe.id}/'
+        for method, action_path in (
+            ('get', f'{path}favorite/'),
+            ('delete', f'{path}favorite/'),
+            ('patch', path),
+        ):
+            with self.subTest(method=method, path=action_path):
+                self.assertEqual(
+                    self.get_recipe_flags(method, action_path), {False}
+                )
+
+
+class CacheFillPrimaryReadsTest(RecordReadsMixin, TestCase):
+    """Данные для кэша читаются с основной БД, а не с реплики."""
+
+    @classmethod
+    def setUpTestData(cls):
+        recipes = create_recipes(create_user('author'), 3)
+        cls.recipe = recipes[0]
+        RecipeRanking.objects.bulk_create(
+            RecipeRanking(recipe=recipe, window='week', rank=rank, score=1,
+                          favorites=1, carts=0)
+            for rank, recipe in enumerate(recipes, 1)
+        )
+
+    def get_async(self, view, path, *args):
+        return async_to_sync(view)(AsyncRequestFactory().get(
+            path, accept='application/json'
+        ), *args)
+
+    def test_uncached_detail_reads_replica(self):
+        APIClient().get(f'/api/recipes/{self.recipe.id}/')
+        self.assertIn((Recipe, True), self.reads)
+
+    def test_response_cache_fill_reads_primary(self):
+        APIClient().get('/api/tags/')
+        self.get_async(async_views.ingredients, '/api/ingredients/')
+        self.assertIn((Tag, False), self.reads)
+        self.assertIn((Ingredient, False), self.reads)
+        self.assertNotIn(True, {flag for model, flag in self.reads})
+
+    def test_feed_cache_fill_reads_primary(self):
+        APIClient().get('/api/recipes/?limit=2')
+        self.get_async(async_views.recipes, '/api/recipes/?limit=2&page=2')
+        self.assertIn((Recipe, False), self.reads)
+        self.assertNotIn(True, {flag for model, flag in self.reads})
+
+    @override_settings(PAGINATION_COUNT_EXACT_LIMIT=1)
+    def test_count_cache_fill_reads_primary(self):
+        response = APIClient().get('/api/recipes/popular/?limit=1')
+        self.assertEqual(response.data['count'], 3)
+        self.assertIn((Recipe, True), self.reads)
+        self.assertIn((Recipe, False), self.reads)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentFavoriteTest(TransactionTestCase):
+    """Одновременные запросы к избранному меняют связь и счётчик один раз.
+
+    Каждый поток работает через своё соединение, поэтому тест
+    запускается только на PostgreSQL: тестовая база SQLite в Django не
+    рассчитана на несколько соединений. У рецепта нет изображения,
+    чтобы после коммита не запускалась подготовка уменьшенных копий.
+    """
+
+    threads = 8
+
+    def setUp(self):
+        self.user = create_user('reader')
+        self.recipe = create_recipes(create_user('author'), 1, image='')[0]
+        self.path = f'/api/recipes/{self.recipe.id}/favorite/'
+
+    def send_concurrently(self, method):
+        barrier = Barrier(self.threads)
+
+        def send(number):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                return getattr(client, method)(self.path).status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(self.threads) as executor:
+            return sorted(executor.map(send, range(self.threads)))
+
+    def assert_favorites(self, statuses, success, count):
+        self.assertEqual(
+            statuses, [success] + [400] * (self.threads - 1)
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, count)
+        self.assertEqual(self.user.favorites.count(), count)
+
+    def test_concurrent_add_and_remove(self):
+        self.assert_favorites(self.send_concurrently('post'), 201, 1)
+        self.assert_favorites(self.send_concurrently('delete'), 204, 0)
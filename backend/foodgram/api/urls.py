@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
@@ -16,3 +17,13 @@ urlpatterns = (
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 )
+
+if settings.ASYNC_API_ENABLED:
+    from . import async_views
+
+    urlpatterns = (
+        path('tags/', async_views.tags),
+        path('ingredients/', async_views.ingredients),
+        path('recipes/', async_views.recipes),
+        path('recipes/<int:pk>/', async_views.recipe),
+    ) + urlpatterns
@@ -1,60 +1,82 @@
-from urllib.parse import unquote
+from itertools import chain
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.http.response import HttpResponse
+from django.contrib.auth.models import AnonymousUser
+from django.http.response import FileResponse, StreamingHttpResponse
 
 from djoser.views import UserViewSet as DjoserUserViewSet
 
-from recipes.models import AmountIngredient, Ingredient, Recipe, Tag
+from foodgram.routers import primary_reads
+from recipes.models import Ingredient, Recipe, RecipeRanking, Tag
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
 
 
-from .mixins import AddDelViewMixin
+from .cache import feed_key, get_cache
+from .mixins import AddDelViewMixin, CachedResponseMixin, ReplicaReadMixin
 from .paginators import PageNumberPaginatorModified
 from .permissions import AdminOrReadOnly, AuthorOrReadOnly
+from .renderers import (ShoppingListCSVRenderer, ShoppingListPDFRenderer,
+                        ShoppingListTextRenderer, spool)
+from .search import search_ingredients
 from .serializers import (IngredientSerializer, RecipeSerializer,
                           RecipeShortSerializer, TagSerializer,
                           UserSubscribeSerializer)
+from .services import (annotate_user_flags, apply_user_flags,
+                       filter_recipes, get_recipes_limit,
+                       get_shopping_list, prefetch_author_recipes,
+                       prefetch_recipe_relations)
 
 User = get_user_model()
 
-incorrect_layout = str.maketrans(
-    'qwertyuiop[]asdfghjkl;\'zxcvbnm,./',
-    'йцукенгшщзхъфывапролджэячсмитьбю.'
-)
-
 
 class UserViewSet(DjoserUserViewSet, AddDelViewMixin):
     pagination_class = PageNumberPaginatorModified
     add_serializer = UserSubscribeSerializer
+    cursor_ordering = ('username', 'id')
 
     @action(methods=('get', 'post', 'delete',), detail=True)
     def subscribe(self, request, id):
         return self.add_del_obj(id, 'subscribe')
 
+    @action(methods=('post', 'delete',), detail=False,
+            url_path='subscribe')
+    def subscribe_bulk(self, request):
+        return self.add_del_objs('subscribe')
+
     @action(methods=('get',), detail=False)
     def subscriptions(self, request):
         user = self.request.user
         if user.is_anonymous:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
-        authors = user.subscribe.all()
+        authors = prefetch_author_recipes(
+            user.subscribe.order_by('username'), get_recipes_limit(request)
+        )
         pages = self.paginate_queryset(authors)
         serializer = UserSubscribeSerializer(
-            pages, many=True, context={'request': request}
+            authors if pages is None else pages,
+            many=True, context={'request': request}
         )
+        if pages is None:
+            return Response(serializer.data)
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, CachedResponseMixin,
+                 viewsets.ReadOnlyModelViewSet):
+    cache_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AdminOrReadOnly,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, CachedResponseMixin,
+                        viewsets.ReadOnlyModelViewSet):
+    cache_namespace = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AdminOrReadOnly,)
@@ -63,57 +85,103 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
         name = self.request.query_params.get('name')
         queryset = self.queryset
         if name:
-            if name[0] == '%':
-                name = unquote(name)
-            else:
-                name = name.translate(incorrect_layout)
-            name = name.lower()
-            stw_queryset = list(queryset.filter(name__startswith=name))
-            cnt_queryset = queryset.filter(name__contains=name)
-            stw_queryset.extend(
-                [i for i in cnt_queryset if i not in stw_queryset]
-            )
-            queryset = stw_queryset
+            queryset = search_ingredients(queryset, name)
         return queryset
 
 
-class RecipeViewSet(viewsets.ModelViewSet, AddDelViewMixin):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet,
+                    AddDelViewMixin):
     queryset = Recipe.objects.select_related('author')
     serializer_class = RecipeSerializer
     permission_classes = (AuthorOrReadOnly,)
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
     pagination_class = PageNumberPaginatorModified
     add_serializer = RecipeShortSerializer
+    cursor_ordering = ('-pub_date', '-id')
+    cursor_actions = ('list',)
+    replica_actions = ('list', 'retrieve', 'popular',)
+    cache_namespace = 'recipes'
+    count_cache_params = ('tags', 'author')
+    count_estimate = True
+    feed_cache_params = ('tags', 'author', 'page', 'limit', 'cursor')
 
     def get_queryset(self):
-        queryset = self.queryset
-
-        tags = self.request.query_params.getlist('tags')
-        if tags:
-            queryset = queryset.filter(
-                tags__slug__in=tags).distinct()
+        return self.get_recipes(self.request.user)
 
-        author = self.request.query_params.get('author')
-        if author:
-            queryset = queryset.filter(author=author)
+    def get_recipes(self, user):
+        queryset = filter_recipes(annotate_user_flags(
+            prefetch_recipe_relations(self.queryset), user
+        ), self.request.query_params)
 
-        user = self.request.user
         if user.is_anonymous:
             return queryset
 
         is_in_shopping = self.request.query_params.get('is_in_shopping_cart')
         if is_in_shopping in ('1', 'true',):
-            queryset = queryset.filter(cart=user.id)
+            queryset = queryset.filter(is_in_shopping_cart=True)
         elif is_in_shopping in ('0', 'false',):
-            queryset = queryset.exclude(cart=user.id)
+            queryset = queryset.filter(is_in_shopping_cart=False)
 
         is_favorited = self.request.query_params.get('is_favorited')
         if is_favorited in ('1', 'true',):
-            queryset = queryset.filter(favorite=user.id)
+            queryset = queryset.filter(is_favorited=True)
         if is_favorited in ('0', 'false',):
-            queryset = queryset.exclude(favorite=user.id)
+            queryset = queryset.filter(is_favorited=False)
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        if not set(request.query_params).issubset(self.feed_cache_params):
+            return super().list(request, *args, **kwargs)
+
+        key = feed_key(self.cache_namespace, request)
+        cache = get_cache()
+        data = cache.get(key)
+        count_strategy = 'cached'
+        if data is None:
+            data, count_strategy = self.build_feed()
+            cache.set(key, data, settings.API_CACHE_TIMEOUT)
+        if request.user.is_authenticated:
+            apply_user_flags(data, request.user)
+        response = Response(data)
+        if isinstance(data, dict) and 'count' in data:
+            response[self.paginator.count_strategy_header] = count_strategy
+        return response
+
+    def build_feed(self):
+        """Лента для анонимного пользователя и способ подсчёта записей.
+
+        Общая для синхронного и асинхронного списка рецептов; читается с
+        основной БД, потому что результат кэшируется.
+        """
+        with primary_reads():
+            data = self.get_feed_data()
+        return data, getattr(self.paginator, 'count_strategy', None)
+
+    def get_feed_data(self):
+        queryset = self.get_recipes(AnonymousUser())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return self.get_serializer(queryset, many=True).data
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data).data
+
+    @action(methods=('get',), detail=False)
+    def popular(self, request):
+        window = request.query_params.get('window', 'week')
+        if window not in RecipeRanking.WINDOWS:
+            raise ValidationError({'window': (
+                f'Допустимые значения: {", ".join(RecipeRanking.WINDOWS)}'
+            )})
+        queryset = self.get_recipes(request.user).filter(
+            rankings__window=window
+        ).order_by('rankings__rank')
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.get_serializer(queryset, many=True).data)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(methods=('get', 'post', 'delete',), detail=True)
     def favorite(self, request, pk):
         return self.add_del_obj(pk, 'favorite')
@@ -122,29 +190,45 @@ class RecipeViewSet(viewsets.ModelViewSet, AddDelViewMixin):
     def shopping_cart(self, request, pk):
         return self.add_del_obj(pk, 'shopping_cart')
 
-    @action(methods=('get',), detail=False)
+    @action(methods=('post', 'delete',), detail=False,
+            url_path='favorite')
+    def favorite_bulk(self, request):
+        return self.add_del_objs('favorite')
+
+    @action(methods=('post', 'delete',), detail=False,
+            url_path='shopping_cart')
+    def shopping_cart_bulk(self, request):
+        return self.add_del_objs('shopping_cart')
+
+    @action(
+        methods=('get',),
+        detail=False,
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListPDFRenderer,
+        ),
+    )
     def download_shopping_cart(self, request):
         user = self.request.user
-        if not user.carts.exists():
+        if user.is_anonymous:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+        rows = get_shopping_list(user)
+        first_row = next(rows, None)
+        if first_row is None:
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        ingredients = AmountIngredient.objects.filter(
-            recipe__in=(user.carts.values('id'))
-        ).values(
-            ingredient=models.F('ingredients__name'),
-            measure=models.F('ingredients__measurement_unit')
-        ).annotate(amount=models.Sum('amount'))
-
-        filename = f'{user.username}_shopping_list.txt'
-        shopping_list = (
-            f'Список покупок для:\n\n{user.first_name}\n\n'
-        )
-        for ing in ingredients:
-            shopping_list += (
-                f'{ing["ingredient"]}: {ing["amount"]} {ing["measure"]}\n'
-            )
 
-        response = HttpResponse(
-            shopping_list, content_type='text.txt; charset=utf-8'
-        )
+        renderer = request.accepted_renderer
+        filename = f'{user.username}_shopping_list.{renderer.format}'
+        content_type = f'{renderer.media_type}; charset={renderer.charset}'
+        chunks = renderer.stream(chain((first_row,), rows), user)
+        if settings.SERVER_MODE == 'asgi':
+            # Django 4.1 iterates streaming responses on the event loop
+            # under ASGI; build the file here, in the view's thread.
+            response = FileResponse(spool(chunks), content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                chunks, content_type=content_type
+            )
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
@@ -0,0 +1,117 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.total}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class QueryStats:
+    """Per-process request, query and DB time histograms by endpoint."""
+
+    metrics = (
+        ('duration', 'foodgram_request_duration_seconds', DURATION_BUCKETS),
+        ('db_time', 'foodgram_request_db_seconds', DURATION_BUCKETS),
+        ('queries', 'foodgram_request_queries', QUERY_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = defaultdict(self.create)
+
+    def create(self):
+        return {
+            key: Histogram(buckets) for key, _, buckets in self.metrics
+        }
+
+    def observe(self, endpoint, method, status, **values):
+        with self._lock:
+            histograms = self._data[(endpoint, method, status // 100)]
+            for key, value in values.items():
+                histograms[key].observe(value)
+
+    def render(self):
+        with self._lock:
+            data = sorted(self._data.items())
+            lines = []
+            for key, name, _ in self.metrics:
+                lines.append(f'# TYPE {name} histogram')
+                for (endpoint, method, status), histograms in data:
+                    labels = (
+                        f'endpoint="{endpoint}",method="{method}",'
+                        f'status="{status}xx"'
+                    )
+                    lines.extend(histograms[key].render(name, labels))
+        return '\n'.join(lines) + '\n'
+
+
+class CacheStats:
+    """Per-process hit and miss counters of a cache."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def observe(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def render(self):
+        name = 'foodgram_cache_requests_total'
+        with self._lock:
+            return (
+                f'{name}{{cache="{self.name}",result="hit"}} {self.hits}\n'
+                f'{name}{{cache="{self.name}",result="miss"}} {self.misses}\n'
+            )
+
+
+query_stats = QueryStats()
+token_cache_stats = CacheStats('token')
+
+
+def metrics_view(request):
+    if not settings.QUERY_STATS_ENABLED:
+        raise Http404
+    token = settings.QUERY_STATS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    allowed = request.user.is_staff or (
+        token and constant_time_compare(authorization, f'Bearer {token}')
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        query_stats.render()
+        + '# TYPE foodgram_cache_requests_total counter\n'
+        + token_cache_stats.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,93 @@
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import query_stats
+
+logger = logging.getLogger('foodgram.query_stats')
+
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SQL_LISTS = re.compile(r'\((?:\s*(?:%s|\?|\$\d+)\s*,)+\s*(?:%s|\?|\$\d+)\s*\)')
+
+
+def get_sql_shape(sql):
+    return SQL_LISTS.sub('(...)', SQL_LITERALS.sub('?', sql))
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - started
+            self.count += 1
+            self.shapes[get_sql_shape(sql)] += 1
+
+
+def get_endpoint(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    view_class = getattr(view, 'cls', None)
+    if view_class is None:
+        return match.view_name or view.__name__
+    action = getattr(view, 'actions', {}).get(request.method.lower())
+    return f'{view_class.__name__}.{action or request.method.lower()}'
+
+
+class QueryStatsMiddleware:
+    def __init__(self, get_response):
+        if not settings.QUERY_STATS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = perf_counter() - started
+
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f};'
+            f'desc="{recorder.count} queries", '
+            f'app;dur={duration * 1000:.1f}'
+        )
+        endpoint = get_endpoint(request)
+        query_stats.observe(
+            endpoint, request.method, response.status_code,
+            duration=duration,
+            db_time=recorder.duration,
+            queries=recorder.count,
+        )
+        if duration * 1000 >= settings.QUERY_STATS_SLOW_MS:
+            self.log_slow_request(request, endpoint, duration, recorder)
+        return response
+
+    def log_slow_request(self, request, endpoint, duration, recorder):
+        shapes = '\n'.join(
+            f'  {count} x {shape}'
+            for shape, count in recorder.shapes.most_common(
+                settings.QUERY_STATS_TOP_SHAPES
+            )
+        )
+        logger.warning(
+            'Slow request %s %s (%s): %.0f ms, %d queries, %.0f ms in DB\n%s',
+            request.method, request.get_full_path(), endpoint,
+            duration * 1000, recorder.count, recorder.duration * 1000, shapes,
+        )
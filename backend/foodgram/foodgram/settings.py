@@ -7,6 +7,8 @@ SECRET_KEY = os.getenv('SECRET_KEY',
                        default='r^bjd6_(*n1!ckvchbn_jgp=y$9dpm=2t=1*tazajnaxj=)+9$')
 DEBUG = False
 
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+
 
 ALLOWED_HOSTS = ['*']
 
@@ -31,6 +33,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.QueryStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,9 +82,44 @@ else:
             'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
             'HOST': os.environ.get('DB_HOST'),
             'PORT': os.environ.get('DB_PORT'),
+            'CONN_MAX_AGE': int(os.getenv(
+                'DB_CONN_MAX_AGE', default=0 if SERVER_MODE == 'asgi' else 60
+            )),
+            'CONN_HEALTH_CHECKS': os.getenv(
+                'DB_CONN_HEALTH_CHECKS', default='True'
+            ) == 'True',
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+                'DB_DISABLE_SERVER_SIDE_CURSORS', default='False'
+            ) == 'True',
         }
     }
 
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', default=300))
+API_CACHE_MAX_AGE = int(os.getenv('API_CACHE_MAX_AGE', default=60))
+
+PAGINATION_COUNT_EXACT_LIMIT = int(os.getenv('PAGINATION_COUNT_EXACT_LIMIT', default=1000))
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', default=60))
 
 
 # Password validation
@@ -110,7 +148,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
 }
@@ -145,4 +183,33 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
 MEDIA_URL = '/backend_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media')
 
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', default=2621440))
+DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('DATA_UPLOAD_MAX_MEMORY_SIZE', default=2621440))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=20))
+INGREDIENT_INDEX_ENABLED = os.getenv('INGREDIENT_INDEX_ENABLED', default='False') == 'True'
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', default='False') == 'True'
+QUERY_STATS_SLOW_MS = int(os.getenv('QUERY_STATS_SLOW_MS', default=500))
+QUERY_STATS_TOP_SHAPES = int(os.getenv('QUERY_STATS_TOP_SHAPES', default=5))
+QUERY_STATS_TOKEN = os.getenv('QUERY_STATS_TOKEN', default='')
+
+ASYNC_API_ENABLED = SERVER_MODE == 'asgi'
+
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', default=60))
+
+BULK_IDS_LIMIT = int(os.getenv('BULK_IDS_LIMIT', default=100))
+
+IMAGE_RENDITIONS = {
+    'thumb': (480, 480),
+    'medium': (1280, 1280),
+}
+IMAGE_RENDITION_FORMATS = ('webp', 'jpeg')
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', default=2))
@@ -0,0 +1,24 @@
+import os
+
+bind = '0:8000'
+preload_app = True
+
+if os.getenv('SERVER_MODE') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+
+def when_ready(server):
+    """Warm the ingredient index in the master before workers fork."""
+    from django.conf import settings
+    from django.db import DatabaseError
+
+    if settings.INGREDIENT_INDEX_ENABLED:
+        from recipes.index import warm_ingredient_index
+
+        try:
+            warm_ingredient_index()
+        except DatabaseError:
+            server.log.exception('Failed to warm the ingredient index')
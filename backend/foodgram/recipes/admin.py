@@ -1,7 +1,10 @@
 from django.contrib.admin import ModelAdmin, TabularInline, register
 from django.utils.safestring import mark_safe
 
-from .models import AmountIngredient, Ingredient, Recipe, Tag
+from api.cache import bump_version
+
+from .index import ingredient_index
+from .models import AmountIngredient, Ingredient, Recipe, RecipeRanking, Tag
 
 
 class IngredientInline(TabularInline):
@@ -25,22 +28,32 @@ class IngredientAdmin(ModelAdmin):
     list_filter = (
         'name',
     )
+    actions = ('rebuild_search_index',)
 
     save_on_top = True
     empty_value_display = 'Значение не указано'
 
+    def rebuild_search_index(self, request, queryset):
+        bump_version('ingredients')
+        ingredient_index.invalidate()
+        self.message_user(request, 'Индекс поиска ингредиентов обновлён')
+
+    rebuild_search_index.short_description = 'Перестроить индекс поиска'
+
 
 @register(Recipe)
 class RecipeAdmin(ModelAdmin):
     list_display = (
-        'name', 'author', 'get_image',
+        'name', 'author', 'get_image', 'favorites_count',
     )
     fields = (
         ('name', 'cooking_time',),
         ('author', 'tags',),
         ('text',),
         ('image',),
+        ('favorites_count', 'in_carts_count',),
     )
+    readonly_fields = ('favorites_count', 'in_carts_count',)
     raw_id_fields = ('author',)
     search_fields = (
         'name', 'author',
@@ -70,3 +83,14 @@ class TagAdmin(ModelAdmin):
 
     save_on_top = True
     empty_value_display = 'Значение не указано'
+
+
+@register(RecipeRanking)
+class RecipeRankingAdmin(ModelAdmin):
+    list_display = (
+        'window', 'rank', 'recipe', 'score', 'favorites', 'carts',
+    )
+    list_filter = ('window',)
+    raw_id_fields = ('recipe',)
+
+    empty_value_display = 'Значение не указано'
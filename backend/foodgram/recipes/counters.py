@@ -0,0 +1,31 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).values(
+                field
+            ).annotate(total=Count('*')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_counters(recipe_model, user_model):
+    recipe_model.objects.update(
+        favorites_count=count_subquery(
+            recipe_model.favorite.through.objects, 'recipe'
+        ),
+        in_carts_count=count_subquery(
+            recipe_model.cart.through.objects, 'recipe'
+        ),
+    )
+    user_model.objects.update(
+        recipes_count=count_subquery(recipe_model.objects, 'author'),
+        subscribers_count=count_subquery(
+            user_model.subscribe.through.objects, 'to_myuser'
+        ),
+    )
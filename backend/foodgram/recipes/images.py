@@ -0,0 +1,99 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'recipe_images/renditions'
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_RENDITION_WORKERS,
+                thread_name_prefix='renditions',
+            )
+    return _executor
+
+
+def get_rendition_name(source, label, extension):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'{RENDITIONS_DIR}/{stem}_{label}.{extension}'
+
+
+def render(image, size, extension):
+    image_format, options = FORMATS[extension]
+    rendition = image.copy()
+    rendition.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and rendition.mode != 'RGB':
+        rendition = rendition.convert('RGB')
+    buffer = BytesIO()
+    rendition.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def create_renditions(source, overwrite=False):
+    with default_storage.open(source) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    renditions = {'source': source}
+    for label, size in settings.IMAGE_RENDITIONS.items():
+        renditions[label] = {}
+        for extension in settings.IMAGE_RENDITION_FORMATS:
+            name = get_rendition_name(source, label, extension)
+            if overwrite:
+                default_storage.delete(name)
+            if not default_storage.exists(name):
+                saved = default_storage.save(
+                    name, ContentFile(render(image, size, extension))
+                )
+                if saved != name:
+                    default_storage.delete(saved)
+            renditions[label][extension] = name
+    return renditions
+
+
+def process_recipe_image(recipe_id, source):
+    from .models import Recipe
+
+    close_old_connections()
+    try:
+        renditions = create_renditions(source)
+        recipe = Recipe.objects.filter(id=recipe_id, image=source).first()
+        if recipe is not None:
+            recipe.image_renditions = renditions
+            recipe.save(update_fields=('image_renditions',))
+    except Exception:
+        logger.exception(
+            'Failed to render %s for recipe %s', source, recipe_id
+        )
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(recipe):
+    source = recipe.image.name
+    transaction.on_commit(
+        lambda: get_executor().submit(process_recipe_image, recipe.id, source)
+    )
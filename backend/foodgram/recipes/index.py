@@ -0,0 +1,108 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import connection
+
+from api.cache import get_version
+from foodgram.routers import primary_reads
+
+from .models import Ingredient
+
+NGRAM_SIZE = 3
+
+
+def ngrams(value, size=NGRAM_SIZE):
+    for length in range(1, size + 1):
+        for start in range(len(value) - length + 1):
+            yield value[start:start + length]
+
+
+class IngredientIndex:
+    """Read-only in-memory copy of the ingredient catalogue.
+
+    Names are kept in a sorted array for prefix lookups with bisect and
+    in a map of 1..NGRAM_SIZE character n-grams for substring lookups.
+    The index remembers the `ingredients` version of the API cache it
+    was built for and is rebuilt lazily when that version changes, so an
+    edit made in one worker reaches the others through the shared cache.
+    `invalidate()` only drops the copy of the current process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+
+    def load(self, version=None):
+        with primary_reads():
+            ingredients = sorted(
+                Ingredient.objects.only('id', 'name', 'measurement_unit'),
+                key=lambda ingredient: (
+                    ingredient.name.lower(), ingredient.id
+                ),
+            )
+        keys = [ingredient.name.lower() for ingredient in ingredients]
+        grams = defaultdict(set)
+        for position, key in enumerate(keys):
+            for gram in ngrams(key):
+                grams[gram].add(position)
+        self._data = (keys, ingredients, dict(grams))
+        self._version = version
+
+    def invalidate(self):
+        self._data = None
+
+    def get_data(self):
+        version = get_version('ingredients')
+        data = self._data
+        if data is None or self._version != version:
+            with self._lock:
+                if self._data is None or self._version != version:
+                    self.load(version)
+                data = self._data
+        return data
+
+    def search(self, candidates, limit):
+        keys, ingredients, grams = self.get_data()
+        found = []
+        seen = set()
+
+        def collect(positions):
+            for position in positions:
+                if len(found) >= limit:
+                    return
+                if position not in seen:
+                    seen.add(position)
+                    found.append(position)
+
+        for candidate in candidates:
+            start = bisect_left(keys, candidate)
+            end = start
+            while end < len(keys) and keys[end].startswith(candidate):
+                end += 1
+            collect(range(start, end))
+
+        substring_hits = set()
+        for candidate in candidates:
+            postings = [
+                grams.get(gram, set())
+                for gram in ngrams(candidate)
+                if len(gram) == min(len(candidate), NGRAM_SIZE)
+            ]
+            substring_hits.update(
+                position for position in set.intersection(*postings)
+                if candidate in keys[position]
+            )
+        collect(sorted(substring_hits))
+        return [ingredients[position] for position in found]
+
+
+ingredient_index = IngredientIndex()
+
+
+def warm_ingredient_index():
+    ingredient_index.get_data()
+    # Close the connection opened for loading so that forked gunicorn
+    # workers (--preload) do not share the parent's socket.
+    connection.close()
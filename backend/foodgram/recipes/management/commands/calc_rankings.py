@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from recipes.models import RecipeEvent, RecipeRanking
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярных рецептов по событиям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--favorite-weight', type=int, default=2)
+        parser.add_argument('--cart-weight', type=int, default=1)
+        parser.add_argument('--size', type=int, default=500)
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалить события старше самого длинного периода',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        for window, days in RecipeRanking.WINDOWS.items():
+            rankings = self.get_rankings(
+                now - timedelta(days=days), window, options
+            )
+            with transaction.atomic():
+                RecipeRanking.objects.filter(window=window).delete()
+                RecipeRanking.objects.bulk_create(rankings)
+            self.stdout.write(f'{window}: {len(rankings)} рецептов')
+
+        if options['prune']:
+            oldest = now - timedelta(days=max(RecipeRanking.WINDOWS.values()))
+            deleted, _ = RecipeEvent.objects.filter(
+                created__lt=oldest
+            ).delete()
+            self.stdout.write(f'Удалено событий: {deleted}')
+
+    def get_rankings(self, since, window, options):
+        totals = RecipeEvent.objects.filter(created__gte=since).values(
+            'recipe'
+        ).annotate(
+            favorites=Coalesce(Sum(
+                'value', filter=Q(kind=RecipeEvent.FAVORITE)
+            ), 0),
+            carts=Coalesce(Sum(
+                'value', filter=Q(kind=RecipeEvent.SHOPPING_CART)
+            ), 0),
+        ).order_by()
+        scored = sorted(
+            (
+                (
+                    total['favorites'] * options['favorite_weight']
+                    + total['carts'] * options['cart_weight'],
+                    total,
+                )
+                for total in totals
+            ),
+            key=lambda item: (-item[0], item[1]['recipe']),
+        )
+        return [
+            RecipeRanking(
+                recipe_id=total['recipe'],
+                window=window,
+                rank=rank,
+                score=score,
+                favorites=total['favorites'],
+                carts=total['carts'],
+            )
+            for rank, (score, total) in enumerate(
+                scored[:options['size']], start=1
+            )
+            if score > 0
+        ]
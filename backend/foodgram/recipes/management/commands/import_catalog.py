@@ -0,0 +1,189 @@
+import csv
+import json
+from itertools import cycle
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import bump_version
+from recipes.index import ingredient_index
+from recipes.models import Ingredient, Tag
+
+WHITESPACE = ' \t\n\r'
+SEPARATORS = WHITESPACE + ','
+MEASUREMENT_UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'стакан')
+
+
+def skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in SEPARATORS:
+        position += 1
+    return position
+
+
+def decode_items(decoder, buffer, final):
+    position = 0
+    while True:
+        position = skip_separators(buffer, position)
+        if position == len(buffer) or buffer[position] == ']':
+            return position
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return position
+        if end == len(buffer) and not final:
+            return position
+        yield item
+        position = end
+
+
+def iter_json_items(file, chunk_size):
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip(WHITESPACE)
+    while not buffer:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            raise ValueError('Пустой файл')
+        buffer = chunk.lstrip(WHITESPACE)
+    if buffer[0] != '[':
+        raise ValueError('Ожидался JSON-массив')
+    buffer = buffer[1:]
+    while True:
+        chunk = file.read(chunk_size)
+        buffer += chunk
+        position = yield from decode_items(decoder, buffer, not chunk)
+        if buffer[position:position + 1] == ']':
+            return
+        buffer = buffer[position:]
+        if not chunk:
+            raise ValueError('Неожиданный конец файла')
+
+
+def iter_csv_items(file):
+    for row in csv.reader(file):
+        if not row or row[:2] == ['name', 'measurement_unit']:
+            continue
+        yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+def iter_synthetic_items(total):
+    units = cycle(MEASUREMENT_UNITS)
+    for number in range(total):
+        yield {
+            'name': f'ингредиент {number:07d}',
+            'measurement_unit': next(units),
+        }
+
+
+def get_record(item):
+    if 'model' in item:
+        return item['model'], item.get('fields', {})
+    if 'slug' in item:
+        return 'recipes.tag', item
+    return 'recipes.ingredient', item
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает ингредиенты и теги из JSON или CSV '
+        'пакетными upsert-запросами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--chunk-size', type=int, default=64 * 1024)
+        parser.add_argument(
+            '--synthetic', type=int, default=0,
+            help='Сгенерировать указанное число ингредиентов вместо файла',
+        )
+
+    def handle(self, *args, **options):
+        if not options['paths'] and not options['synthetic']:
+            raise CommandError('Укажите файлы или --synthetic')
+        self.batch_size = options['batch_size']
+        self.processed = 0
+        self.tags_changed = False
+        self.started = perf_counter()
+
+        for path in options['paths']:
+            self.stdout.write(f'Загрузка {path}')
+            try:
+                with open(path, encoding='utf-8', newline='') as file:
+                    if Path(path).suffix.lower() == '.csv':
+                        items = iter_csv_items(file)
+                    else:
+                        items = iter_json_items(file, options['chunk_size'])
+                    self.load(items)
+            except (OSError, ValueError, KeyError, IndexError) as error:
+                raise CommandError(f'{path}: {error}')
+        if options['synthetic']:
+            self.load(iter_synthetic_items(options['synthetic']))
+
+        ingredient_index.invalidate()
+        bump_version('ingredients')
+        if self.tags_changed:
+            bump_version('tags')
+            bump_version('recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {self.processed} записей, '
+            f'{self.get_rate():.0f} в секунду'
+        ))
+
+    def load(self, items):
+        ingredients = {}
+        tags = {}
+        for item in items:
+            model, fields = get_record(item)
+            if model == 'recipes.ingredient':
+                key = (fields['name'].strip(), fields['measurement_unit'])
+                ingredients[key] = Ingredient(
+                    name=key[0], measurement_unit=key[1]
+                )
+            elif model == 'recipes.tag':
+                tags[fields['slug']] = Tag(
+                    name=fields['name'],
+                    color=fields.get('color'),
+                    slug=fields['slug'],
+                )
+            else:
+                continue
+            if len(ingredients) >= self.batch_size:
+                self.save_ingredients(ingredients)
+            if len(tags) >= self.batch_size:
+                self.save_tags(tags)
+        self.save_ingredients(ingredients)
+        self.save_tags(tags)
+
+    def save_ingredients(self, ingredients):
+        if not ingredients:
+            return
+        Ingredient.objects.bulk_create(
+            ingredients.values(), ignore_conflicts=True
+        )
+        self.report(len(ingredients))
+        ingredients.clear()
+
+    def save_tags(self, tags):
+        if not tags:
+            return
+        Tag.objects.bulk_create(
+            tags.values(),
+            update_conflicts=True,
+            unique_fields=('slug',),
+            update_fields=('name', 'color',),
+        )
+        self.tags_changed = True
+        self.report(len(tags))
+        tags.clear()
+
+    def report(self, count):
+        self.processed += count
+        self.stdout.write(
+            f'  {self.processed} записей, {self.get_rate():.0f} в секунду'
+        )
+
+    def get_rate(self):
+        return self.processed / max(perf_counter() - self.started, 1e-6)
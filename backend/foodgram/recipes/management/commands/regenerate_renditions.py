@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import bump_version
+from recipes.images import create_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие уменьшенные копии изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии для всех рецептов',
+        )
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_renditions'
+        )
+        for recipe in recipes.iterator(chunk_size=200):
+            source = recipe.image.name
+            if (not options['all']
+                    and recipe.image_renditions.get('source') == source):
+                continue
+            try:
+                renditions = create_renditions(source, options['all'])
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{recipe.id}: {error}')
+                continue
+            Recipe.objects.filter(id=recipe.id, image=source).update(
+                image_renditions=renditions
+            )
+            done += 1
+        if done:
+            bump_version('recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX IF NOT EXISTS recipe_favorite_user_recipe_idx '
+                'ON recipes_recipe_favorite (myuser_id, recipe_id)',
+                'CREATE INDEX IF NOT EXISTS recipe_cart_user_recipe_idx '
+                'ON recipes_recipe_cart (myuser_id, recipe_id)',
+                'CREATE INDEX IF NOT EXISTS recipe_tags_tag_recipe_idx '
+                'ON recipes_recipe_tags (tag_id, recipe_id)',
+            ),
+            reverse_sql=(
+                'DROP INDEX IF EXISTS recipe_favorite_user_recipe_idx',
+                'DROP INDEX IF EXISTS recipe_cart_user_recipe_idx',
+                'DROP INDEX IF EXISTS recipe_tags_tag_recipe_idx',
+            ),
+        ),
+    ]
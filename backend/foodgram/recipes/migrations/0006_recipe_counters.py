@@ -0,0 +1,54 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).values(
+                field
+            ).annotate(total=Count('*')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    MyUser = apps.get_model('users', 'MyUser')
+    Recipe.objects.update(
+        favorites_count=count_subquery(
+            Recipe.favorite.through.objects, 'recipe'
+        ),
+        in_carts_count=count_subquery(Recipe.cart.through.objects, 'recipe'),
+    )
+    MyUser.objects.update(
+        recipes_count=count_subquery(Recipe.objects, 'author'),
+        subscribers_count=count_subquery(
+            MyUser.subscribe.through.objects, 'to_myuser'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_filter_indexes'),
+        ('users', '0003_myuser_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
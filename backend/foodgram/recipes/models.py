@@ -101,6 +101,12 @@ class Recipe(models.Model):
         verbose_name='Изображение блюда',
         upload_to='recipe_images/',
     )
+    image_renditions = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name='Описание блюда',
         max_length=150,
@@ -109,11 +115,31 @@ class Recipe(models.Model):
         verbose_name='Время приготовления',
         default=0,
         validators=[MinValueValidator(1)])
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx',
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('name', 'author'),
@@ -158,3 +184,93 @@ class AmountIngredient(models.Model):
 
     def __str__(self):
         return f'{self.amount} {self.ingredients}'
+
+
+class RecipeEvent(models.Model):
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    KINDS = (
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+    )
+
+    recipe = models.ForeignKey(
+        verbose_name='Рецепт',
+        related_name='events',
+        to=Recipe,
+        on_delete=models.CASCADE,
+    )
+    kind = models.CharField(
+        verbose_name='Тип события',
+        max_length=16,
+        choices=KINDS,
+    )
+    value = models.SmallIntegerField(
+        verbose_name='Изменение',
+        default=1,
+    )
+    created = models.DateTimeField(
+        verbose_name='Время события',
+        auto_now_add=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Событие рецепта'
+        verbose_name_plural = 'События рецептов'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.kind} {self.value:+d}'
+
+
+class RecipeRanking(models.Model):
+    WINDOWS = {
+        'day': 1,
+        'week': 7,
+        'month': 30,
+    }
+
+    recipe = models.ForeignKey(
+        verbose_name='Рецепт',
+        related_name='rankings',
+        to=Recipe,
+        on_delete=models.CASCADE,
+    )
+    window = models.CharField(
+        verbose_name='Период',
+        max_length=8,
+        choices=[(window, window) for window in WINDOWS],
+    )
+    rank = models.PositiveIntegerField(
+        verbose_name='Место',
+    )
+    score = models.IntegerField(
+        verbose_name='Рейтинг',
+    )
+    favorites = models.IntegerField(
+        verbose_name='Добавлений в избранное',
+    )
+    carts = models.IntegerField(
+        verbose_name='Добавлений в список покупок',
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        ordering = ('window', 'rank',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('window', 'recipe',),
+                name='unique_recipe_for_window',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('window', 'rank'),
+                name='ranking_window_rank_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.window}: {self.rank}. {self.recipe_id}'
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .images import schedule_renditions
+from .index import ingredient_index
+from .models import Ingredient, Recipe
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(instance, created, **kwargs):
+    if created:
+        User.objects.filter(id=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def render_recipe_image(instance, **kwargs):
+    source = instance.image_renditions.get('source')
+    if instance.image and source != instance.image.name:
+        schedule_renditions(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(instance, **kwargs):
+    User.objects.filter(id=instance.author_id).update(
+        recipes_count=Greatest(F('recipes_count') - 1, 0)
+    )
+
+
+@receiver(pre_delete, sender=User)
+def decrease_user_counters(instance, **kwargs):
+    Recipe.objects.filter(favorite=instance).update(
+        favorites_count=Greatest(F('favorites_count') - 1, 0)
+    )
+    Recipe.objects.filter(cart=instance).update(
+        in_carts_count=Greatest(F('in_carts_count') - 1, 0)
+    )
+    User.objects.filter(subscribers=instance).update(
+        subscribers_count=Greatest(F('subscribers_count') - 1, 0)
+    )
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX IF NOT EXISTS myuser_subscribe_to_from_idx '
+                'ON users_myuser_subscribe (to_myuser_id, from_myuser_id)'
+            ),
+            reverse_sql='DROP INDEX IF EXISTS myuser_subscribe_to_from_idx',
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db.models import (CharField, EmailField,
-                              ManyToManyField)
+                              ManyToManyField, PositiveIntegerField)
 from django.db.models.functions import Length
 from django.utils.translation import gettext_lazy as _
 
@@ -38,6 +38,16 @@ class MyUser(AbstractUser):
         to='self',
         symmetrical=False,
     )
+    recipes_count = PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'